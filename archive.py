@@ -0,0 +1,226 @@
+"""Columnar archive for rows moved out of the live database.
+
+Rows are stored in partitions, one directory per table, semester and
+course, each holding one or more immutable parts::
+
+    <root>/<table>/<semester>/<course>/part-0001/
+        meta.json        row count, column kinds, string dictionaries
+        <column>.npy     one array per column
+        <column>.valid.npy  null mask, only for columns that had nulls
+
+Every ``.npy`` file is a plain numeric array, so parts are opened with
+``np.load(mmap_mode='r')`` and filtered without reading whole columns into
+memory. Column kinds are ``int`` (int64), ``float`` (float64), ``bool``,
+``datetime`` (datetime64[us]) and ``str``, which is dictionary-encoded as
+int32 codes into a list kept in meta.json (-1 for null).
+
+Parts are written to a hidden staging directory and renamed into place, so
+readers never see half-written parts. ``manifest.json`` at the root holds a
+generation number that changes whenever parts are published. NumPy is
+imported on first use, so the app can start without loading it.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+COLUMN_DTYPES = {
+    'int': 'int64',
+    'float': 'float64',
+    'bool': 'bool',
+    'datetime': 'datetime64[us]',
+}
+
+
+def slugify(value):
+    return re.sub(r'[^A-Za-z0-9]+', '_', value).strip('_') or '_'
+
+
+def encode_column(kind, values):
+    # -> (data array, valid mask or None, dictionary or None)
+    import numpy as np
+
+    valid = np.array([value is not None for value in values], dtype=bool)
+    if kind == 'str':
+        dictionary = sorted({value for value in values if value is not None})
+        lookup = {value: code for code, value in enumerate(dictionary)}
+        data = np.array([-1 if value is None else lookup[value] for value in values], dtype=np.int32)
+        return data, None, dictionary
+    if kind == 'datetime':
+        data = np.array([np.datetime64('NaT') if value is None else value for value in values],
+                        dtype=COLUMN_DTYPES[kind])
+    else:
+        fill = {'int': 0, 'float': np.nan, 'bool': False}[kind]
+        data = np.array([fill if value is None else value for value in values], dtype=COLUMN_DTYPES[kind])
+    return data, (None if valid.all() else valid), None
+
+
+class StagedPart:
+    """A fully written part waiting to be renamed into its partition."""
+
+    def __init__(self, archive, staging_dir, partition_dir):
+        self.archive = archive
+        self.staging_dir = staging_dir
+        self.partition_dir = partition_dir
+
+    def publish(self):
+        with self.archive.lock:
+            existing = [name for name in os.listdir(self.partition_dir) if name.startswith('part-')]
+            path = os.path.join(self.partition_dir, f'part-{len(existing) + 1:04d}')
+            os.rename(self.staging_dir, path)
+        return path
+
+    def discard(self):
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+class ArchivePart:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.table = self.meta['table']
+        self.semester = self.meta['semester']
+        self.course = self.meta['course']
+        self.rows = self.meta['rows']
+        self.kinds = {column['name']: column['kind'] for column in self.meta['columns']}
+        self.names = [column['name'] for column in self.meta['columns']]
+
+    def column(self, name):
+        # Raw array: values, or dictionary codes for str columns
+        import numpy as np
+
+        return np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+
+    def valid(self, name):
+        import numpy as np
+
+        path = os.path.join(self.path, f'{name}.valid.npy')
+        if self.kinds[name] == 'str':
+            return self.column(name) >= 0
+        if not os.path.exists(path):
+            return np.ones(self.rows, dtype=bool)
+        return np.load(path, mmap_mode='r')
+
+    def dictionary(self, name):
+        return self.meta['dictionaries'][name]
+
+    def equals(self, name, value):
+        # Row mask for name == value (value None matches nulls)
+        import numpy as np
+
+        if value is None:
+            return ~np.asarray(self.valid(name))
+        if self.kinds[name] == 'str':
+            dictionary = self.dictionary(name)
+            try:
+                code = dictionary.index(value)
+            except ValueError:
+                return np.zeros(self.rows, dtype=bool)
+            return np.asarray(self.column(name) == code)
+        return np.asarray(self.column(name) == value) & self.valid(name)
+
+    def decode(self, name, index):
+        # Python values (None for nulls) of column name at the given row indices
+        if name not in self.kinds:
+            # Column added after this part was written
+            return [None] * len(index)
+        data = self.column(name)[index]
+        if self.kinds[name] == 'str':
+            dictionary = self.dictionary(name)
+            return [None if code < 0 else dictionary[code] for code in data.tolist()]
+        if self.kinds[name] == 'datetime':
+            values = data.astype(datetime).tolist()
+        else:
+            values = data.tolist()
+        valid = self.valid(name)[index]
+        if valid.all():
+            return values
+        return [value if ok else None for value, ok in zip(values, valid.tolist())]
+
+    def iter_rows(self, index, row_type, batch_size=1000):
+        # row_type(*values) per selected row, in index order, decoded a batch at a time
+        import numpy as np
+
+        index = np.asarray(index)
+        for offset in range(0, len(index), batch_size):
+            batch = index[offset:offset + batch_size]
+            columns = [self.decode(name, batch) for name in row_type._fields]
+            for values in zip(*columns):
+                yield row_type(*values)
+
+
+class Archive:
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+
+    def stage(self, table, semester, course, columns):
+        # columns: [(name, kind, values)]; returns a StagedPart to publish
+        # once the rows have been removed from the live table
+        import numpy as np
+
+        partition_dir = os.path.join(self.root, table, semester, slugify(course))
+        os.makedirs(partition_dir, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix='.staging-', dir=partition_dir)
+        try:
+            meta = {'table': table, 'semester': semester, 'course': course, 'rows': 0,
+                    'columns': [], 'dictionaries': {}}
+            for name, kind, values in columns:
+                data, valid, dictionary = encode_column(kind, values)
+                np.save(os.path.join(staging_dir, f'{name}.npy'), data)
+                if valid is not None:
+                    np.save(os.path.join(staging_dir, f'{name}.valid.npy'), valid)
+                if dictionary is not None:
+                    meta['dictionaries'][name] = dictionary
+                meta['columns'].append({'name': name, 'kind': kind})
+                meta['rows'] = len(data)
+            with open(os.path.join(staging_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        return StagedPart(self, staging_dir, partition_dir)
+
+    def parts(self, table, semester=None, course=None):
+        # Published parts, newest semester first; course filters by name
+        table_dir = os.path.join(self.root, table)
+        if not os.path.isdir(table_dir):
+            return []
+        parts = []
+        semesters = [semester] if semester else sorted(os.listdir(table_dir), reverse=True)
+        for semester_name in semesters:
+            semester_dir = os.path.join(table_dir, semester_name)
+            if not os.path.isdir(semester_dir):
+                continue
+            courses = [slugify(course)] if course else sorted(os.listdir(semester_dir))
+            for course_slug in courses:
+                course_dir = os.path.join(semester_dir, course_slug)
+                if not os.path.isdir(course_dir):
+                    continue
+                for name in sorted(os.listdir(course_dir)):
+                    if name.startswith('part-'):
+                        part = ArchivePart(os.path.join(course_dir, name))
+                        # Different courses can share a slug
+                        if course is None or part.course == course:
+                            parts.append(part)
+        return parts
+
+    def generation(self):
+        try:
+            with open(os.path.join(self.root, 'manifest.json'), encoding='utf-8') as f:
+                return json.load(f)['generation']
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def bump_generation(self):
+        with self.lock:
+            os.makedirs(self.root, exist_ok=True)
+            path = os.path.join(self.root, 'manifest.json')
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'generation': self.generation() + 1}, f)
+            os.replace(tmp_path, path)
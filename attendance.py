@@ -0,0 +1,1159 @@
+"""Attendance check-in: lecture sessions, submissions, courses, rosters and locations."""
+import concurrent.futures
+import csv
+import io
+import itertools
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime, timedelta
+from functools import partial
+
+import click
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask_login import login_required, current_user
+from flask_wtf import FlaskForm
+from sqlalchemy import event, insert, select, update, delete, bindparam
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import NotFound
+from wtforms import StringField, SubmitField
+from wtforms.validators import DataRequired
+
+from dedup import SubmissionIndex, session_window_start
+from extensions import db
+from geocoding import ChainProvider, SingleFlight, build_provider, cell_center, cell_key
+from geofence import Geofence, LOCATION_FLAGS, score_location, score_locations
+from group_commit import GroupCommitWriter
+from models import (Attendance, Course, Enrollment, GeocodeCell, LectureSession, Student, StudentRecord,
+                    apply_counter_deltas, apply_rollup_deltas, course_catalog, log_record_changes,
+                    resolve_course)
+from records import RECORDS_PER_PAGE
+from roster import RosterIndex, normalize_matric_no
+from ttl_cache import TTLCache
+
+bp = Blueprint('attendance', __name__, cli_group=None)
+
+
+class AttendanceForm(FlaskForm):
+    name = StringField('Full Name', validators=[DataRequired()])
+    matric_no = StringField('Matric Number', validators=[DataRequired()])
+    course = StringField('Course', validators=[DataRequired()])
+    submit = SubmitField('Submit Attendance')
+
+
+# Lecture sessions
+OpenSession = namedtuple('OpenSession', 'id course title opens_at closes_at geofence')
+open_session_cache = TTLCache(maxsize=1)  # ttl: OPEN_SESSION_CACHE_TTL, set in create_app()
+
+
+def get_open_sessions():
+    # Sessions that have not closed yet (including upcoming ones), cached so
+    # the submit path does not look them up per request
+    sessions = open_session_cache.get('sessions')
+    if sessions is None:
+        rows = LectureSession.query.filter(LectureSession.closes_at >= datetime.now()).all()
+        sessions = sorted((OpenSession(row.id, row.course, row.title, row.opens_at, row.closes_at,
+                                       row.get_geofence())
+                           for row in rows), key=lambda s: s.opens_at)
+        open_session_cache.set('sessions', sessions)
+    return sessions
+
+
+def open_sessions_now(at=None):
+    at = at or datetime.now()
+    return [s for s in get_open_sessions() if s.opens_at <= at <= s.closes_at]
+
+
+def resolve_lecture_session(session_id, course, at):
+    # Raises ValueError if an explicitly chosen session is not open
+    open_now = open_sessions_now(at)
+    if session_id:
+        match = next((s for s in open_now if s.id == session_id), None)
+        if match is None:
+            raise ValueError('This lecture session is not open for check-in')
+        return match
+    # No session picked: attach to the open session for this course, if any
+    return next((s for s in open_now if s.course == course), None)
+
+
+@event.listens_for(db.session, 'after_flush')
+def note_changed_lecture_sessions(session, flush_context):
+    if any(isinstance(obj, LectureSession) for obj in session.new | session.dirty | session.deleted):
+        session.info['lecture_sessions_changed'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def refresh_open_sessions(session):
+    if session.info.pop('lecture_sessions_changed', False):
+        open_session_cache.clear()
+
+
+def parse_session_datetime(value, field):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be an ISO 8601 date/time')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def session_to_dict(lecture_session, attendance_count=None):
+    return {
+        'id': lecture_session.id,
+        'course': lecture_session.course,
+        'title': lecture_session.title,
+        'opens_at': lecture_session.opens_at.isoformat(),
+        'closes_at': lecture_session.closes_at.isoformat(),
+        'is_open': lecture_session.is_open(),
+        'geofence': {
+            'latitude': lecture_session.geofence_lat,
+            'longitude': lecture_session.geofence_lng,
+            'radius_m': lecture_session.geofence_radius_m,
+            'polygon': json.loads(lecture_session.geofence_polygon) if lecture_session.geofence_polygon else None
+        } if lecture_session.geofence_radius_m or lecture_session.geofence_polygon else None,
+        'attendance_count': attendance_count,
+        'records_url': url_for('records.records_data', session_id=lecture_session.id),
+        'csv_url': url_for('exports.download_all_csv', session_id=lecture_session.id)
+    }
+
+
+def session_attendance_counts(session_ids):
+    # One grouped query served by the (session_id, timestamp) index
+    if not session_ids:
+        return {}
+    return dict(db.session.query(StudentRecord.session_id, db.func.count(StudentRecord.id))
+                .filter(StudentRecord.session_id.in_(session_ids))
+                .group_by(StudentRecord.session_id)
+                .all())
+
+
+def get_own_lecture_session(session_id):
+    lecture_session = db.session.get(LectureSession, session_id)
+    if lecture_session is None or lecture_session.lecturer_id != current_user.id:
+        raise NotFound()
+    return lecture_session
+
+
+@bp.route('/sessions', methods=['GET', 'POST'])
+@login_required
+def lecture_sessions():
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    if request.method == 'GET':
+        query = LectureSession.query.filter_by(lecturer_id=current_user.id)
+        if request.args.get('course'):
+            query = query.filter_by(course=course_catalog.lookup(request.args['course'])[1])
+        rows = query.order_by(LectureSession.opens_at.desc()).limit(RECORDS_PER_PAGE).all()
+        counts = session_attendance_counts([row.id for row in rows])
+        return jsonify({
+            'success': True,
+            'sessions': [session_to_dict(row, counts.get(row.id, 0)) for row in rows]
+        })
+
+    data = request.get_json(silent=True) or request.form
+    try:
+        # Lecturers define the catalog, so their codes are taken as typed (canonicalised)
+        _, course = resolve_course(data.get('course'), create=True, fuzzy=False)
+        opens_at = parse_session_datetime(data['opens_at'], 'opens_at') if data.get('opens_at') else datetime.now()
+        if data.get('closes_at'):
+            closes_at = parse_session_datetime(data['closes_at'], 'closes_at')
+        else:
+            try:
+                minutes = int(data.get('duration_minutes') or current_app.config['LECTURE_SESSION_MINUTES'])
+            except (TypeError, ValueError):
+                raise ValueError('duration_minutes must be a number')
+            closes_at = opens_at + timedelta(minutes=minutes)
+        if closes_at <= opens_at:
+            raise ValueError('closes_at must be after opens_at')
+
+        geofence = [data.get(key) for key in ('geofence_lat', 'geofence_lng', 'geofence_radius_m')]
+        if any(value not in (None, '') for value in geofence):
+            try:
+                geofence = [float(value) for value in geofence]
+            except (TypeError, ValueError):
+                raise ValueError('Geofence needs numeric geofence_lat, geofence_lng and geofence_radius_m')
+            Geofence(*geofence)
+        else:
+            geofence = [None, None, None]
+
+        polygon = data.get('geofence_polygon') or None
+        if isinstance(polygon, str):
+            try:
+                polygon = json.loads(polygon)
+            except ValueError:
+                raise ValueError('geofence_polygon must be a JSON list of [lat, lng] points')
+        if polygon is not None:
+            try:
+                polygon = [[float(lat), float(lng)] for lat, lng in polygon]
+            except (TypeError, ValueError):
+                raise ValueError('geofence_polygon must be a JSON list of [lat, lng] points')
+            Geofence(polygon=polygon)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    lecture_session = LectureSession(
+        course=course,
+        lecturer_id=current_user.id,
+        title=(data.get('title') or '').strip() or None,
+        opens_at=opens_at,
+        closes_at=closes_at,
+        geofence_lat=geofence[0],
+        geofence_lng=geofence[1],
+        geofence_radius_m=geofence[2],
+        geofence_polygon=json.dumps(polygon) if polygon else None
+    )
+    db.session.add(lecture_session)
+    db.session.commit()
+    return jsonify({'success': True, 'session': session_to_dict(lecture_session, 0)}), 201
+
+@bp.route('/sessions/<int:session_id>')
+@login_required
+def lecture_session_detail(session_id):
+    lecture_session = get_own_lecture_session(session_id)
+    count = StudentRecord.query.filter_by(session_id=session_id).count()
+    return jsonify({'success': True, 'session': session_to_dict(lecture_session, count)})
+
+@bp.route('/sessions/<int:session_id>/close', methods=['POST'])
+@login_required
+def close_lecture_session(session_id):
+    lecture_session = get_own_lecture_session(session_id)
+    now = datetime.now()
+    if lecture_session.closes_at > now:
+        lecture_session.closes_at = max(now, lecture_session.opens_at)
+        db.session.commit()
+    count = StudentRecord.query.filter_by(session_id=session_id).count()
+    return jsonify({'success': True, 'session': session_to_dict(lecture_session, count)})
+
+
+# Geofence checks
+def geofence_limits():
+    return {'slack_m': current_app.config['GEOFENCE_SLACK_M'],
+            'max_accuracy_m': current_app.config['GEOFENCE_MAX_ACCURACY_M']}
+
+
+def check_location(fence, values):
+    # Stores the geofence verdict on a submission's column values
+    values['location_flag'], values['location_distance_m'] = score_location(
+        fence, values['latitude'], values['longitude'], values['accuracy'], **geofence_limits())
+
+
+def rescore_locations(course=None, fallback_fence=None):
+    # Re-checks every StudentRecord (of one course) against its session's
+    # geofence in one vectorised pass per fence, writing back only the rows
+    # whose verdict changed. Rows without a session use fallback_fence, or
+    # are marked unchecked. Returns a Counter of flags.
+    import numpy as np  # loaded on first use, not at worker startup
+    table = StudentRecord.__table__
+    query = select(table.c.id, table.c.session_id, table.c.latitude, table.c.longitude,
+                   table.c.accuracy, table.c.location_flag, table.c.location_distance_m)
+    if course:
+        query = query.where(table.c.course == course)
+    # Plain Core rows: ORM row processing costs more than the scoring at 100k rows
+    rows = db.session.connection().execute(query).all()
+    if not rows:
+        return Counter()
+
+    ids, session_ids, lats, lngs, accuracies, old_flags, old_distances = zip(*rows)
+    session_ids = np.array([session_id or 0 for session_id in session_ids])
+    # None becomes NaN, which score_locations treats as missing
+    lats, lngs, accuracies, old_distances = (np.array(column, dtype=float)
+                                             for column in (lats, lngs, accuracies, old_distances))
+    flag_codes = {flag: code for code, flag in enumerate(LOCATION_FLAGS)}
+    old_flags = np.array([flag_codes.get(flag, -1) for flag in old_flags], dtype=np.int8)
+
+    fences = {0: fallback_fence}
+    known_ids = [int(session_id) for session_id in np.unique(session_ids) if session_id]
+    for start in range(0, len(known_ids), BULK_LOOKUP_CHUNK):
+        chunk = known_ids[start:start + BULK_LOOKUP_CHUNK]
+        fences.update((row.id, row.get_geofence())
+                      for row in LectureSession.query.filter(LectureSession.id.in_(chunk)))
+
+    flags = np.full(len(ids), -1, dtype=np.int8)  # -1: no fence to check against
+    distances = np.full(len(ids), np.nan)
+    limits = geofence_limits()
+    for session_id, fence in fences.items():
+        if fence is None:
+            continue
+        mask = session_ids == session_id
+        if mask.any():
+            flags[mask], distances[mask] = score_locations(
+                fence, lats[mask], lngs[mask], accuracies[mask], **limits)
+    distances = np.round(distances, 1)
+
+    same_distance = (distances == old_distances) | (np.isnan(distances) & np.isnan(old_distances))
+    changed = np.flatnonzero((flags != old_flags) | ~same_distance)
+    if len(changed):
+        db.session.connection().execute(
+            table.update().where(table.c.id == bindparam('row_id'))
+            .values(location_flag=bindparam('flag'), location_distance_m=bindparam('distance')),
+            [{'row_id': ids[idx],
+              'flag': LOCATION_FLAGS[flags[idx]] if flags[idx] >= 0 else None,
+              'distance': None if np.isnan(distances[idx]) else float(distances[idx])}
+             for idx in changed]
+        )
+        log_record_changes(db.session.connection(), [ids[idx] for idx in changed])
+    db.session.commit()
+
+    tally = np.bincount(flags.astype(np.int64) + 1, minlength=len(LOCATION_FLAGS) + 1)
+    return Counter({flag: int(count) for flag, count in zip(('unchecked',) + LOCATION_FLAGS, tally) if count})
+
+
+def location_flag_counts(course=None):
+    query = db.session.query(StudentRecord.location_flag, db.func.count(StudentRecord.id))
+    if course:
+        query = query.filter(StudentRecord.course == course)
+    return {flag or 'unchecked': count for flag, count in query.group_by(StudentRecord.location_flag)}
+
+
+@bp.route('/records/locations', methods=['GET', 'POST'])
+@login_required
+def record_locations():
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    data = request.get_json(silent=True) or request.values
+    course = course_catalog.lookup(data.get('course'))[1] or None
+    if request.method == 'GET':
+        return jsonify({'success': True, 'course': course, 'counts': location_flag_counts(course)})
+
+    # Optional fence for records that were not taken in a lecture session
+    fallback_fence = None
+    raw_fence = [data.get(key) for key in ('geofence_lat', 'geofence_lng', 'geofence_radius_m')]
+    if any(value not in (None, '') for value in raw_fence):
+        try:
+            fallback_fence = Geofence(*[float(value) for value in raw_fence])
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'Geofence needs numeric geofence_lat, geofence_lng and geofence_radius_m'
+            }), 400
+
+    started = time.perf_counter()
+    counts = rescore_locations(course, fallback_fence)
+    return jsonify({
+        'success': True,
+        'course': course,
+        'counts': dict(counts),
+        'seconds': round(time.perf_counter() - started, 3)
+    })
+
+
+@bp.cli.command('score-locations')
+@click.option('--course', default=None, help='Only re-score this course')
+def score_locations_command(course):
+    """Re-check stored submission locations against their session geofences."""
+    counts = rescore_locations(course_catalog.lookup(course)[1] if course else None)
+    print(', '.join(f'{flag}: {count}' for flag, count in sorted(counts.items())) or 'No records')
+
+
+# Reverse geocoding with a per-cell cache. 300 students in one hall share
+# one cell, so at most one provider call is made for them per process, and
+# none once the cell is in geocode_cell.
+geocode_cache = TTLCache(maxsize=4096, ttl=300)
+geocode_flight = SingleFlight()
+_geocoder = None
+_geocoder_lock = threading.Lock()
+_geocode_inserts = itertools.count(1)  # next() is atomic, so threads can share it
+GEOCODE_PRUNE_EVERY = 100
+
+
+def get_geocoder():
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            providers = []
+            for spec in filter(None, (part.strip() for part in current_app.config['GEOCODER_PROVIDERS'].split(','))):
+                if spec == 'gazetteer' and not os.path.exists(current_app.config['GEOCODER_GAZETTEER']):
+                    continue
+                try:
+                    providers.append(build_provider(spec, current_app.config))
+                except (OSError, ValueError) as e:
+                    if spec != 'gazetteer':
+                        raise
+                    # Like a missing one; otherwise every lookup would retry and fail
+                    current_app.logger.warning(f"Skipping the gazetteer geocoder: {str(e)}")
+            _geocoder = ChainProvider(providers)
+        return _geocoder
+
+
+def reverse_geocode(lat, lng, local_only=False):
+    # Returns (name, source): source is 'memory', 'cache' or the provider
+    # that answered. local_only skips network providers (submit path).
+    key = cell_key(lat, lng, current_app.config['GEOCODE_CELL_METERS'])
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        return cached[0], 'memory'
+    return geocode_flight.do((key, local_only), lambda: lookup_geocode_cell(key, local_only))
+
+
+def lookup_geocode_cell(key, local_only):
+    now = datetime.now()
+    row = db.session.get(GeocodeCell, key)
+    if row is not None and row.expires_at > now:
+        if row.last_used_at < now - timedelta(hours=1):
+            # Coarse LRU stamp; avoids a write on every hit
+            row.last_used_at = now
+            db.session.commit()
+        geocode_cache.set(key, (row.name,))
+        return row.name, 'cache'
+
+    lat, lng = cell_center(key)
+    name, provider = get_geocoder().reverse(lat, lng, local_only=local_only)
+    if name is None and local_only:
+        # Network providers were not asked, so this is not a real miss
+        return None, None
+
+    lifetime = (timedelta(days=current_app.config['GEOCODE_CACHE_DAYS']) if name
+                else timedelta(minutes=current_app.config['GEOCODE_MISS_MINUTES']))
+    db.session.merge(GeocodeCell(cell=key, name=name, provider=provider,
+                                 expires_at=now + lifetime, last_used_at=now))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another process stored the same cell first
+        db.session.rollback()
+    geocode_cache.set(key, (name,))
+
+    if next(_geocode_inserts) % GEOCODE_PRUNE_EVERY == 0:
+        prune_geocode_cells()
+    return name, provider
+
+
+def prune_geocode_cells():
+    # Drop expired cells, then the least recently used ones over the cap
+    GeocodeCell.query.filter(GeocodeCell.expires_at < datetime.now()).delete(synchronize_session=False)
+    excess = GeocodeCell.query.count() - current_app.config['GEOCODE_CACHE_MAX_CELLS']
+    if excess > 0:
+        oldest = (select(GeocodeCell.cell).order_by(GeocodeCell.last_used_at).limit(excess)
+                  .scalar_subquery())
+        GeocodeCell.query.filter(GeocodeCell.cell.in_(oldest)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+@bp.route('/geocode/reverse')
+@login_required
+def geocode_reverse():
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({'success': False, 'message': 'lat and lng must be valid coordinates'}), 400
+    name, source = reverse_geocode(lat, lng)
+    return jsonify({'success': True, 'location_name': name, 'source': source})
+
+
+@bp.route('/courses')
+@login_required
+def list_courses():
+    return jsonify({
+        'success': True,
+        'courses': [{'id': course_id, 'code': code}
+                    for code, course_id in sorted(course_catalog.codes().items())]
+    })
+
+
+@bp.cli.command('add-course')
+@click.argument('code')
+@click.option('--title', default=None, help='Course title')
+def add_course_command(code, title):
+    """Add a course to the catalog (needed when COURSE_AUTO_CREATE is off)."""
+    course_id, code = resolve_course(code, create=True, fuzzy=False)
+    if title:
+        db.session.get(Course, course_id).title = title
+        db.session.commit()
+    print(f'{code} (id {course_id})')
+
+
+# Student roster. Rosters are imported per course from CSV; submissions are
+# checked against a per-process RosterIndex instead of querying the tables.
+ROSTER_MAX_ROWS = 20000
+ROSTER_FIELD_LIMITS = {'matric_no': 20, 'name': 100, 'course': 50}
+ROSTER_SEARCH_MIN_CHARS = 2
+ROSTER_SEARCH_MAX = 20
+roster_cache = TTLCache(maxsize=1)  # ttl: ROSTER_CACHE_TTL, set in create_app()
+
+
+def get_roster():
+    roster = roster_cache.get('roster')
+    if roster is None:
+        rows = db.session.execute(
+            select(Student.matric_no, Student.name, Enrollment.course_id)
+            .outerjoin(Enrollment, Enrollment.student_id == Student.id)
+            .where(Student.active.isnot(False))
+        ).all()
+        roster = RosterIndex(rows)
+        roster_cache.set('roster', roster)
+    return roster
+
+
+@event.listens_for(db.session, 'after_flush')
+def note_changed_roster(session, flush_context):
+    if any(isinstance(obj, (Student, Enrollment)) for obj in session.new | session.dirty | session.deleted):
+        session.info['roster_changed'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def refresh_roster(session):
+    if session.info.pop('roster_changed', False):
+        roster_cache.clear()
+
+
+def roster_student(matric_no, course_id, course):
+    # The roster entry for a submission, or None when the course has no
+    # roster (anyone may submit); raises ValueError if the student isn't on it
+    if not current_app.config['ROSTER_ENFORCE']:
+        return None
+    roster = get_roster()
+    if not roster.has_roster(course_id):
+        return None
+    entry = roster.get(matric_no)
+    if entry is None or course_id not in entry.course_ids:
+        raise ValueError(f'{matric_no} is not on the roster for {course}')
+    return entry
+
+
+def import_roster(rows, course=None, replace=False):
+    # rows: dicts with matric_no, name and course (course is the default for
+    # rows without one). Adds missing students and enrollments and updates
+    # changed names; replace also unenrols students missing from the rows.
+    # Invalid rows are reported and skipped. Caller commits.
+    summary = {'students_created': 0, 'students_updated': 0, 'enrolled': 0, 'unenrolled': 0,
+               'errors': []}
+    names = {}
+    enrollments = set()  # (course_id, matric_no)
+    for idx, row in enumerate(rows):
+        if not isinstance(row, dict):
+            summary['errors'].append({'row': idx, 'message': 'Row must be an object'})
+            continue
+        values = {key: str(row.get(key) or '').strip() for key in ROSTER_FIELD_LIMITS}
+        values['matric_no'] = normalize_matric_no(values['matric_no'])
+        values['course'] = values['course'] or course or ''
+        error = None
+        if not values['matric_no'] or not values['course']:
+            error = 'Matric Number and Course are required!'
+        for key, limit in ROSTER_FIELD_LIMITS.items():
+            if not error and len(values[key]) > limit:
+                error = f'{key} must be at most {limit} characters'
+        if not error:
+            try:
+                course_id, _ = resolve_course(values['course'], create=True, fuzzy=False)
+            except ValueError as e:
+                error = str(e)
+        if error:
+            summary['errors'].append({'row': idx, 'message': error})
+            continue
+        if values['name'] or values['matric_no'] not in names:
+            names[values['matric_no']] = values['name'] or None
+        enrollments.add((course_id, values['matric_no']))
+
+    students = {}  # matric_no -> id
+    renamed = []
+    matric_nos = list(names)
+    for start in range(0, len(matric_nos), BULK_LOOKUP_CHUNK):
+        chunk = matric_nos[start:start + BULK_LOOKUP_CHUNK]
+        for student_id, matric_no, name in db.session.execute(
+                select(Student.id, Student.matric_no, Student.name).where(Student.matric_no.in_(chunk))):
+            students[matric_no] = student_id
+            if names[matric_no] and names[matric_no] != name:
+                renamed.append({'id': student_id, 'name': names[matric_no]})
+    if renamed:
+        db.session.execute(update(Student), renamed)
+        summary['students_updated'] = len(renamed)
+    new_students = [{'matric_no': matric_no, 'name': names[matric_no], 'active': True}
+                    for matric_no in matric_nos if matric_no not in students]
+    if new_students:
+        new_ids = db.session.execute(
+            insert(Student).returning(Student.id, sort_by_parameter_order=True), new_students
+        ).scalars().all()
+        students.update(zip((values['matric_no'] for values in new_students), new_ids))
+        summary['students_created'] = len(new_students)
+
+    course_ids = {course_id for course_id, _ in enrollments}
+    wanted = {(course_id, students[matric_no]) for course_id, matric_no in enrollments}
+    existing = {}
+    if course_ids:
+        existing = {(course_id, student_id): enrollment_id for enrollment_id, course_id, student_id in
+                    db.session.execute(select(Enrollment.id, Enrollment.course_id, Enrollment.student_id)
+                                       .where(Enrollment.course_id.in_(course_ids)))}
+    now = datetime.now()
+    added = [{'course_id': course_id, 'student_id': student_id, 'created_at': now}
+             for course_id, student_id in sorted(wanted - existing.keys())]
+    if added:
+        db.session.execute(insert(Enrollment), added)
+        summary['enrolled'] = len(added)
+    if replace:
+        dropped = [existing[key] for key in existing.keys() - wanted]
+        for start in range(0, len(dropped), BULK_LOOKUP_CHUNK):
+            db.session.execute(delete(Enrollment).where(
+                Enrollment.id.in_(dropped[start:start + BULK_LOOKUP_CHUNK])))
+        summary['unenrolled'] = len(dropped)
+    # Core statements skip the flush hook
+    db.session.info['roster_changed'] = True
+    return summary
+
+
+@bp.route('/roster', methods=['POST'])
+@login_required
+def upload_roster():
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    try:
+        rows = read_bulk_payload()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if len(rows) > ROSTER_MAX_ROWS:
+        return jsonify({'success': False, 'message': f'At most {ROSTER_MAX_ROWS} rows per roster'}), 413
+
+    replace = str(request.values.get('replace') or '').strip().lower() in ('1', 'true', 'yes')
+    try:
+        summary = import_roster(rows, course=request.values.get('course'), replace=replace)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'The roster was changed concurrently, please retry the upload'
+        }), 409
+    return jsonify({'success': True, **summary})
+
+
+@bp.route('/roster/search')
+@login_required
+def search_roster():
+    # Matric number autocomplete for the attendance form; answered from memory
+    prefix = request.args.get('q', '')
+    if len(normalize_matric_no(prefix)) < ROSTER_SEARCH_MIN_CHARS:
+        return jsonify({'success': True, 'students': []})
+    limit = max(1, min(request.args.get('limit', 10, type=int), ROSTER_SEARCH_MAX))
+    roster = get_roster()
+    course_id = course_catalog.lookup(request.args['course'])[0] if request.args.get('course') else None
+    if not roster.has_roster(course_id):
+        course_id = None  # no roster for the course: suggest from everyone
+    response = jsonify({
+        'success': True,
+        'students': [{'matric_no': entry.matric_no, 'name': entry.name}
+                     for entry in roster.complete(prefix, limit, course_id)]
+    })
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
+@bp.cli.command('import-roster')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--course', default=None, help='Course for rows without a course column')
+@click.option('--replace', is_flag=True, help="Unenrol students missing from the file from its courses")
+def import_roster_command(path, course, replace):
+    """Import enrolled students from a CSV file (matric_no, name, course)."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    summary = import_roster(rows, course=course, replace=replace)
+    db.session.commit()
+    print(f"{summary['students_created']} students created, {summary['students_updated']} updated, "
+          f"{summary['enrolled']} enrolled, {summary['unenrolled']} unenrolled")
+    for error in summary['errors']:
+        print(f"row {error['row'] + 2}: {error['message']}")
+
+
+# Attendance Route (Protected)
+@bp.route('/attendance', methods=['GET', 'POST'])
+@login_required
+def attendance():
+    if current_user.role != 'student':
+        flash('Please login as student to access this page', 'danger')
+        return redirect(url_for('auth.login'))
+    
+    form = AttendanceForm()
+    
+    if form.validate_on_submit():
+        name = form.name.data
+        matric_no = form.matric_no.data
+        try:
+            course_id, course = resolve_course(form.course.data)
+            enrolled = roster_student(matric_no, course_id, course)
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return render_template('attendance.html', form=form, open_sessions=open_sessions_now())
+        if enrolled:
+            matric_no, name = enrolled.matric_no, enrolled.name or name
+        
+        new_record = Attendance(name=name, matric_no=matric_no, course=course, course_id=course_id)
+        lecture_session = resolve_lecture_session(None, course, datetime.now())
+        if lecture_session:
+            new_record.session_id = lecture_session.id
+            new_record.session_window = lecture_session.opens_at
+        db.session.add(new_record)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash('Attendance already submitted for this course session!', 'warning')
+            return render_template('attendance.html', form=form, open_sessions=open_sessions_now())
+        
+        return render_template('success.html', record=new_record)
+    
+    return render_template('attendance.html', form=form, open_sessions=open_sessions_now())
+
+@bp.route('/submit_attendance', methods=['POST'])
+@login_required
+def submit_attendance():
+    try:
+        # Required fields
+        name = request.form.get('name')
+        matric_no = request.form.get('matric_no')
+        course = request.form.get('course')
+        
+        # Location data
+        latitude = request.form.get('latitude')
+        longitude = request.form.get('longitude')
+        accuracy = request.form.get('accuracy')
+        location_name = request.form.get('location_name')
+        
+        if not all([name, matric_no, course]):
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return jsonify({
+                    'success': False,
+                    'message': 'Name, Matric Number and Course are required!'
+                }), 400
+            flash('Name, Matric Number and Course are required!', 'danger')
+            return redirect(url_for('attendance.attendance'))
+
+        now = datetime.now()
+        try:
+            # A chosen session fixes the course, so a typo in the box can't add one
+            session_id = request.form.get('session_id', type=int)
+            lecture_session = resolve_lecture_session(session_id, None, now) if session_id else None
+            if lecture_session:
+                course_id, course = resolve_course(lecture_session.course, create=True)
+            else:
+                course_id, course = resolve_course(course)
+                lecture_session = resolve_lecture_session(None, course, now)
+            enrolled = roster_student(matric_no, course_id, course)
+        except ValueError as e:
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return jsonify({'success': False, 'message': str(e)}), 400
+            flash(str(e), 'danger')
+            return redirect(url_for('attendance.attendance'))
+        if enrolled:
+            # The roster's spelling, so duplicates and reports line up
+            matric_no, name = enrolled.matric_no, enrolled.name or name
+        
+        record_values = {
+            'name': name,
+            'matric_no': matric_no,
+            'course': course,
+            'course_id': course_id,
+            'timestamp': now,
+            'latitude': float(latitude) if latitude else None,
+            'longitude': float(longitude) if longitude else None,
+            'accuracy': float(accuracy) if accuracy else None,
+            'location_name': location_name,
+            'active': True,
+            # Always present so group-commit batches insert uniform rows
+            'session_id': None,
+            'location_flag': None,
+            'location_distance_m': None
+        }
+        if not location_name and record_values['latitude'] is not None and record_values['longitude'] is not None:
+            # The browser could not name the place; use the cell cache or gazetteer
+            try:
+                record_values['location_name'] = reverse_geocode(
+                    record_values['latitude'], record_values['longitude'], local_only=True)[0]
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.warning(f"Reverse geocoding failed: {str(e)}")
+        if lecture_session:
+            # The session itself is the duplicate window, however long it runs
+            record_values['session_id'] = lecture_session.id
+            record_values['session_window'] = lecture_session.opens_at
+            if lecture_session.geofence:
+                check_location(lecture_session.geofence, record_values)
+        window, _, _ = submission_key(record_values)
+
+        if current_app.config['GROUP_COMMIT_ENABLED']:
+            # The background writer checks duplicates for the whole batch;
+            # this returns once the batch holding our row has committed.
+            # Hand our pooled connection back first so the writer can get one.
+            db.session.close()
+            pending = get_submission_writer().submit(record_values)
+            try:
+                record_id = pending.result(timeout=current_app.config['GROUP_COMMIT_TIMEOUT'])['id']
+            except concurrent.futures.TimeoutError:  # not the builtin before Python 3.11
+                # Still queued: withdraw it so a retry is not a duplicate.
+                # Otherwise its batch is being written and may yet commit.
+                if pending.cancel():
+                    current_app.logger.warning('Group commit wait timed out; submission withdrawn')
+                    message = 'The server is busy, please try again shortly'
+                else:
+                    current_app.logger.warning('Group commit wait timed out; submission still in flight')
+                    message = 'Your attendance is still being saved, please check again shortly'
+                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                    response = jsonify({'success': False, 'message': message})
+                    response.status_code = 503
+                else:
+                    flash(message, 'warning')
+                    response = redirect(url_for('attendance.attendance'))
+                response.headers['Retry-After'] = str(GROUP_COMMIT_RETRY_AFTER_SECONDS)
+                return response
+        elif submission_index.seen(window, course, matric_no):
+            record_id = None
+        else:
+            # Create new record
+            new_record = StudentRecord(**record_values)
+            db.session.add(new_record)
+            try:
+                db.session.commit()
+                record_id = new_record.id
+            except IntegrityError:
+                # Submitted through another worker process since we loaded the window
+                db.session.rollback()
+                record_id = None
+            submission_index.add(window, course, matric_no)
+
+        if record_id is None:
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return jsonify({
+                    'success': False,
+                    'message': 'Attendance already submitted for this course session!'
+                }), 400
+            flash('Attendance already submitted for this course session!', 'warning')
+            return redirect(url_for('attendance.attendance'))
+
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return jsonify({
+                'success': True,
+                'message': 'Attendance submitted successfully!',
+                'record': {
+                    'id': record_id,
+                    'name': name,
+                    'matric_no': matric_no,
+                    'course': course,
+                    'session_id': record_values['session_id'],
+                    'location_flag': record_values['location_flag'],
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'accuracy': accuracy,
+                    'location_name': record_values['location_name']
+                }
+            })
+
+        flash('Attendance submitted successfully!', 'success')
+        return redirect(url_for('attendance.attendance'))
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error submitting attendance: {str(e)}", exc_info=True)
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return jsonify({
+                'success': False,
+                'message': f'Error submitting attendance: {str(e)}'
+            }), 500
+        
+        flash(f'Error submitting attendance: {str(e)}', 'danger')
+        return redirect(url_for('attendance.attendance'))
+
+
+# Duplicate detection: one submission per (session window, course, matric_no)
+def submission_key(values):
+    values.setdefault('session_window',
+                      session_window_start(values['timestamp'], current_app.config['SESSION_WINDOW_MINUTES']))
+    return values['session_window'], values['course'], values['matric_no']
+
+
+def load_submission_window(window):
+    return (db.session.query(StudentRecord.course, StudentRecord.matric_no)
+            .filter(StudentRecord.session_window == window)
+            .all())
+
+
+def submission_stored(window, course, matric_no):
+    # One probe of ix_student_record_submission
+    return db.session.query(
+        db.session.query(StudentRecord.id)
+        .filter(StudentRecord.session_window == window,
+                StudentRecord.course == course,
+                StudentRecord.matric_no == matric_no)
+        .exists()
+    ).scalar()
+
+
+# Sessions use their own opens_at as the window, so keep a few more loaded.
+# A hit is re-checked in the database, since another worker may have
+# deleted the record.
+submission_index = SubmissionIndex(load_submission_window, keep_windows=8, confirm=submission_stored)
+
+
+# Free the keys of deleted records once the delete commits, so the student
+# can submit again in the same window
+@event.listens_for(db.session, 'after_flush')
+def note_deleted_submissions(session, flush_context):
+    deleted = {(obj.session_window, obj.course, obj.matric_no) for obj in session.deleted
+               if isinstance(obj, StudentRecord) and obj.session_window is not None}
+    if deleted:
+        session.info.setdefault('deleted_submission_keys', set()).update(deleted)
+
+
+@event.listens_for(db.session, 'after_commit')
+def discard_deleted_submissions(session):
+    for key in session.info.pop('deleted_submission_keys', ()):
+        submission_index.discard(*key)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_deleted_submissions(session):
+    session.info.pop('deleted_submission_keys', None)
+
+
+# Bulk attendance upload (offline devices push many submissions at once)
+BULK_MAX_RECORDS = 1000
+BULK_LOOKUP_CHUNK = 400  # stays under SQLite's bound-parameter limit
+BULK_FIELD_LIMITS = {'name': 100, 'matric_no': 20, 'course': 50, 'location_name': 200}
+
+
+def parse_bulk_row(row):
+    # Returns (values, error); values is ready for StudentRecord insert
+    if not isinstance(row, dict):
+        return None, 'Row must be an object'
+    values = {key: str(row.get(key) or '').strip() for key in BULK_FIELD_LIMITS}
+    if not all([values['name'], values['matric_no'], values['course']]):
+        return None, 'Name, Matric Number and Course are required!'
+    for key, limit in BULK_FIELD_LIMITS.items():
+        if len(values[key]) > limit:
+            return None, f'{key} must be at most {limit} characters'
+    values['location_name'] = values['location_name'] or None
+
+    for key in ('latitude', 'longitude', 'accuracy'):
+        raw = row.get(key)
+        try:
+            values[key] = float(raw) if raw not in (None, '') else None
+        except (TypeError, ValueError):
+            return None, f'{key} must be a number'
+
+    # Offline devices send the time the student actually checked in
+    raw_timestamp = row.get('timestamp')
+    try:
+        values['timestamp'] = datetime.fromisoformat(raw_timestamp) if raw_timestamp else datetime.now()
+    except (TypeError, ValueError):
+        return None, 'timestamp must be an ISO 8601 date/time'
+    if values['timestamp'].tzinfo is not None:
+        values['timestamp'] = values['timestamp'].astimezone().replace(tzinfo=None)
+
+    raw_session_id = row.get('session_id')
+    try:
+        values['session_id'] = int(raw_session_id) if raw_session_id not in (None, '') else None
+    except (TypeError, ValueError):
+        return None, 'session_id must be a number'
+
+    values['active'] = True
+    values['location_flag'] = values['location_distance_m'] = None
+    return values, None
+
+
+def read_bulk_payload():
+    upload = request.files.get('file')
+    if upload:
+        text_stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig')
+        return list(csv.DictReader(text_stream))
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('records')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of records or a CSV file upload')
+    return data
+
+
+def existing_submission_keys(keys):
+    # Which (session_window, course, matric_no) keys are already stored
+    found = set()
+    keys = list(keys)
+    for start in range(0, len(keys), BULK_LOOKUP_CHUNK):
+        chunk = keys[start:start + BULK_LOOKUP_CHUNK]
+        rows = (db.session.query(StudentRecord.session_window, StudentRecord.course, StudentRecord.matric_no)
+                .filter(StudentRecord.session_window.in_({key[0] for key in chunk}),
+                        StudentRecord.matric_no.in_({key[2] for key in chunk})))
+        found.update(tuple(row) for row in rows)
+    return found
+
+
+def insert_student_records(rows):
+    # One multi-row INSERT; returns the new ids in row order. Caller commits.
+    inserted = db.session.execute(
+        insert(StudentRecord).returning(StudentRecord.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+    # Core inserts skip the flush hooks, so keep the counters, rollups and change feed in step here
+    deltas = defaultdict(int)
+    for values in rows:
+        deltas[(values['course'], values['active'])] += 1
+    apply_counter_deltas(db.session.connection(), deltas)
+    rollup_deltas = defaultdict(int)
+    for values in rows:
+        rollup_deltas[(values['matric_no'], values['course'], values['timestamp'].date())] += 1
+    apply_rollup_deltas(db.session.connection(), rollup_deltas)
+    log_record_changes(db.session.connection(), inserted)
+    return inserted
+
+
+# Group commit writer for /submit_attendance (GROUP_COMMIT_ENABLED)
+GROUP_COMMIT_RETRY_AFTER_SECONDS = 5
+_submission_writer = None
+_submission_writer_pid = None
+_submission_writer_lock = threading.Lock()
+
+
+def flush_submission_batch(app, batch):
+    # Returns {'id': new_id} per submission, or {'id': None} for duplicates
+    with app.app_context():
+        results = [{'id': None} for _ in batch]
+        batch_keys = set()
+        pending = []
+        for idx, values in enumerate(batch):
+            key = submission_key(values)
+            if key not in batch_keys and not submission_index.seen(*key):
+                batch_keys.add(key)
+                pending.append(idx)
+        if not pending:
+            return results
+
+        try:
+            ids = insert_student_records([batch[idx] for idx in pending])
+            db.session.commit()
+        except IntegrityError:
+            # Lost a race with a writer in another process; retry row by row
+            db.session.rollback()
+            ids = []
+            for idx in pending:
+                try:
+                    ids.extend(insert_student_records([batch[idx]]))
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+                    ids.append(None)
+
+        for idx, record_id in zip(pending, ids):
+            results[idx]['id'] = record_id
+            submission_index.add(*submission_key(batch[idx]))
+        return results
+
+
+def get_submission_writer():
+    global _submission_writer, _submission_writer_pid
+    with _submission_writer_lock:
+        # Threads do not survive a fork, so each worker process starts its own
+        if _submission_writer is None or _submission_writer_pid != os.getpid():
+            _submission_writer = GroupCommitWriter(
+                partial(flush_submission_batch, current_app._get_current_object()),
+                max_batch=current_app.config['GROUP_COMMIT_MAX_BATCH'],
+                max_delay=current_app.config['GROUP_COMMIT_MAX_DELAY_MS'] / 1000
+            )
+            _submission_writer_pid = os.getpid()
+        return _submission_writer
+
+
+@bp.route('/submit_attendance/bulk', methods=['POST'])
+@login_required
+def submit_attendance_bulk():
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    try:
+        rows = read_bulk_payload()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if len(rows) > BULK_MAX_RECORDS:
+        return jsonify({
+            'success': False,
+            'message': f'At most {BULK_MAX_RECORDS} records per upload'
+        }), 413
+
+    # Validate everything first so the database is only touched a fixed
+    # number of times: one session lookup, one duplicate lookup and one
+    # multi-row insert. Offline uploads can span old session windows, so
+    # this checks the database, not the index.
+    results = []
+    parsed = []
+    for idx, row in enumerate(rows):
+        values, error = parse_bulk_row(row)
+        if error:
+            results.append({'row': idx, 'status': 'invalid', 'message': error})
+        else:
+            results.append(None)
+            parsed.append((idx, values))
+
+    session_ids = {values['session_id'] for _, values in parsed if values['session_id']}
+    sessions = {}
+    if session_ids:
+        sessions = {row.id: row for row in LectureSession.query.filter(LectureSession.id.in_(session_ids))}
+    fences = {session_id: row.get_geofence() for session_id, row in sessions.items()}
+
+    valid = []
+    seen = set()
+    for idx, values in parsed:
+        if values['session_id']:
+            lecture_session = sessions.get(values['session_id'])
+            if lecture_session is None:
+                results[idx] = {'row': idx, 'status': 'invalid', 'message': 'Unknown lecture session'}
+                continue
+            if not lecture_session.opens_at <= values['timestamp'] <= lecture_session.closes_at:
+                results[idx] = {'row': idx, 'status': 'invalid',
+                                'message': 'timestamp is outside the lecture session'}
+                continue
+            # The session fixes the course; the row's own course is ignored
+            values['course_id'], values['course'] = resolve_course(lecture_session.course, create=True)
+            values['session_window'] = lecture_session.opens_at
+            if fences[lecture_session.id]:
+                check_location(fences[lecture_session.id], values)
+        else:
+            try:
+                values['course_id'], values['course'] = resolve_course(values['course'])
+            except ValueError as e:
+                results[idx] = {'row': idx, 'status': 'invalid', 'message': str(e)}
+                continue
+        try:
+            enrolled = roster_student(values['matric_no'], values['course_id'], values['course'])
+        except ValueError as e:
+            results[idx] = {'row': idx, 'status': 'invalid', 'message': str(e)}
+            continue
+        if enrolled:
+            values['matric_no'], values['name'] = enrolled.matric_no, enrolled.name or values['name']
+        if submission_key(values) in seen:
+            results[idx] = {'row': idx, 'status': 'duplicate', 'matric_no': values['matric_no'],
+                            'message': 'Duplicate submission in upload'}
+        else:
+            seen.add(submission_key(values))
+            valid.append((idx, values))
+
+    existing = existing_submission_keys(seen)
+    to_insert = []
+    for idx, values in valid:
+        if submission_key(values) in existing:
+            results[idx] = {'row': idx, 'status': 'duplicate', 'matric_no': values['matric_no'],
+                            'message': 'Attendance already submitted for this course session!'}
+        else:
+            to_insert.append((idx, values))
+
+    if to_insert:
+        try:
+            inserted = insert_student_records([values for _, values in to_insert])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'message': 'Some students submitted concurrently, please retry the upload'
+            }), 409
+
+        for (idx, values), record_id in zip(to_insert, inserted):
+            results[idx] = {'row': idx, 'status': 'created', 'id': record_id,
+                            'matric_no': values['matric_no']}
+            submission_index.add(*submission_key(values))
+
+    return jsonify({
+        'success': True,
+        'created': len(to_insert),
+        'rejected': len(rows) - len(to_insert),
+        'results': results
+    })
@@ -0,0 +1,158 @@
+"""Login, registration and the per-process cache of logged-in users."""
+from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask_login import UserMixin, login_user, logout_user, login_required
+from flask_wtf import FlaskForm
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash, check_password_hash
+from wtforms import StringField, PasswordField, SubmitField, SelectField
+from wtforms.validators import DataRequired
+
+from extensions import db, login_manager
+from models import User
+from ttl_cache import TTLCache
+
+bp = Blueprint('auth', __name__)
+
+
+# Lightweight stand-in for User that is safe to share between requests
+class UserSnapshot(UserMixin):
+    def __init__(self, id, username, role, active):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.active = active
+
+    @property
+    def is_active(self):
+        return self.active
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.role, bool(user.active))
+
+
+# Sized from USER_CACHE_SIZE / USER_CACHE_TTL in create_app()
+user_cache = TTLCache()
+
+
+# User loader function required by Flask-Login
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        user_cache.set(user_id, snapshot)
+    if snapshot.active:  # Use your existing active attribute
+        return snapshot
+    return None
+
+
+# Drop cached users when their row changes. Invalidating again after commit
+# covers a request re-caching the old row between our flush and commit.
+# Other worker processes pick the change up when their entry expires.
+@event.listens_for(db.session, 'after_flush')
+def invalidate_changed_users(session, flush_context):
+    changed = {obj.id for obj in session.dirty | session.deleted if isinstance(obj, User)}
+    for user_id in changed:
+        user_cache.invalidate(user_id)
+    session.info.setdefault('changed_user_ids', set()).update(changed)
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_committed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
+
+class LoginForm(FlaskForm):
+    username = StringField('Username', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[DataRequired()])
+    submit = SubmitField('Login')
+
+class RegistrationForm(FlaskForm):
+    username = StringField('Username', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[DataRequired()])
+    role = SelectField('Role', choices=[('student', 'Student'), ('lecturer', 'Lecturer')], validators=[DataRequired()])
+
+# Home Route
+@bp.route('/')
+def index():
+    return render_template('index.html')
+
+# Register Route
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    lecturer_exists = User.query.filter_by(role='lecturer').first() is not None
+    form = RegistrationForm()
+    if form.validate_on_submit():
+        role = request.form.get('role')
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        if not role:
+            flash('Role is required', 'danger')
+            return redirect(url_for('auth.register'))
+        
+        if not username or not password:
+            flash('Username and password are required', 'danger')
+            return redirect(url_for('auth.register'))
+        
+        existing_user = User.query.filter_by(username=username).first()
+        if existing_user:
+            flash('Username already exists!', 'danger')
+            return redirect(url_for('auth.register'))
+        
+        hashed_password = generate_password_hash(password)
+        new_user = User(username=username, password=hashed_password, role=role)
+        
+        db.session.add(new_user)
+        try:
+            db.session.commit()
+            flash('Registration successful! Please login.', 'success')
+            return redirect(url_for('auth.login'))
+        except IntegrityError:
+            db.session.rollback()
+            flash('Registration failed. Please try again.', 'danger')
+    
+    return render_template('register.html', form=form, lecturer_exists=lecturer_exists)
+    
+# Login Route
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    form = LoginForm()
+    
+    if form.validate_on_submit():
+        username = form.username.data
+        password = form.password.data
+        
+        user = User.query.filter_by(username=username).first()
+        
+        if user and check_password_hash(user.password, password):
+            login_user(user)
+            flash('Login successful!', 'success')
+            
+            if user.role == 'lecturer':
+                return redirect(url_for('records.records'))
+            else:
+                return redirect(url_for('attendance.attendance'))
+        else:
+            flash('Invalid username or password!', 'danger')
+    
+    return render_template('login.html', form=form)
+
+# Logout Route
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('You have been logged out.', 'success')
+    return redirect(url_for('auth.index'))
@@ -0,0 +1,358 @@
+"""Load benchmark for the attendance, records and export routes.
+
+Seeds a scratch SQLite database with ``--records`` StudentRecord and
+``--attendance`` Attendance rows, then drives the app through Flask's test
+client from a pool of threads:
+
+* isolated: each route on its own (login, submit_attendance, records,
+  records_data, download_csv and, with --pdf, download_pdf)
+* mixed: a login + submission burst running alongside lecturers paging
+  records and pulling exports
+
+and prints p50/p95/p99 latency, throughput, error count and peak RSS for
+every route in each phase as JSON.
+
+With --gunicorn the same requests go over HTTP to gunicorn, started with
+gunicorn.conf.py on the seeded database, so worker classes can be compared
+(GUNICORN_WORKER_CLASS, WEB_CONCURRENCY and GUNICORN_THREADS are passed
+through). Peak RSS is then not reported, since the server is a separate
+process.
+
+    python benchmarks/load_bench.py --records 20000 --burst 300 --concurrency 16
+    GUNICORN_WORKER_CLASS=sync python benchmarks/load_bench.py --gunicorn --phase mixed
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+
+from bench_utils import ROOT, RssSampler, latency_summary, load_app
+
+COURSES = ['URP 101', 'URP 201', 'URP 301', 'URP 401', 'CSC 301']
+
+
+def seed(app_module, records, attendance, students):
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from models import Attendance, Course, StudentRecord, User
+    from records import rebuild_attendance_counters
+    app, db = app_module.app, app_module.db
+    with app.app_context():
+        db.create_all()
+        # Cheap hash: login latency should measure the app, not PBKDF2 rounds
+        password = generate_password_hash('bench', method='pbkdf2:sha256:1000')
+        db.session.add(User(username='lecturer', password=password, role='lecturer'))
+        db.session.add_all([User(username=f'student{i}', password=password, role='student')
+                            for i in range(students)])
+        # Catalogued up front, so the burst still works with COURSE_AUTO_CREATE off
+        db.session.add_all([Course(code=code) for code in COURSES])
+
+        start = datetime.now() - timedelta(days=120)
+        for model, total in ((StudentRecord, records), (Attendance, attendance)):
+            rows = [{
+                'name': f'Seed Student {i}',
+                'matric_no': f'S{i:07d}',
+                'course': COURSES[i % len(COURSES)],
+                'timestamp': start + timedelta(seconds=i * 30),
+                'latitude': 8.4799 + (i % 100) * 1e-5,
+                'longitude': 8.5156 + (i % 100) * 1e-5,
+                'accuracy': 10 + i % 40,
+                'location_name': 'Faculty of Environmental Sciences',
+            } for i in range(total)]
+            for offset in range(0, total, 5000):
+                db.session.execute(insert(model), rows[offset:offset + 5000])
+        db.session.commit()
+        rebuild_attendance_counters()
+
+
+class HttpResponse:
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+
+    def get_data(self):
+        return self.body
+
+    def get_json(self):
+        return json.loads(self.body)
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Like the test client: report the redirect instead of following it
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """The slice of Flask's test client the routes use, over real HTTP."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()),
+                                                  NoRedirect())
+
+    def open(self, method, path, data=None, query_string=None, headers=None):
+        url = self.base_url + path
+        if query_string:
+            url += '?' + urllib.parse.urlencode(query_string)
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(url, data=body, headers=headers or {}, method=method)
+        try:
+            with self.opener.open(req, timeout=300) as response:
+                return HttpResponse(response.status, response.read(), response.headers)
+        except urllib.error.HTTPError as error:
+            return HttpResponse(error.code, error.read(), error.headers)
+
+    def get(self, path, **kwargs):
+        return self.open('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.open('POST', path, **kwargs)
+
+
+def start_gunicorn(database_url, port):
+    # CSRF is off, as for the in-process test client; the access log goes to stdout
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+               '-b', f'127.0.0.1:{port}',
+               "app:create_app(test_config={'WTF_CSRF_ENABLED': False})"]
+    server = subprocess.Popen(command, cwd=ROOT, env=dict(os.environ, DATABASE_URL=database_url),
+                              stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start listening')
+
+
+class Route:
+    def __init__(self, name, role, call):
+        self.name = name
+        self.role = role
+        self.call = call
+
+
+def login(client, i):
+    return client.post('/login', data={'username': f'student{i}', 'password': 'bench'})
+
+
+def submit(client, i):
+    return client.post('/submit_attendance', data={
+        'name': f'Burst Student {i}',
+        'matric_no': f'B{i:07d}-{time.monotonic_ns()}',
+        'course': COURSES[i % len(COURSES)],
+        'latitude': '8.4799',
+        'longitude': '8.5156',
+        'accuracy': '12',
+    }, headers={'X-Requested-With': 'XMLHttpRequest'})
+
+
+def records_page(client, i):
+    return client.get('/records', query_string={'course': COURSES[i % len(COURSES)]} if i % 2 else None)
+
+
+def records_data(client, i):
+    # Walk a few pages deep to exercise the keyset cursor
+    response = client.get('/records/data')
+    for _ in range(i % 5):
+        if response.status_code != 200:
+            break
+        cursor = response.get_json()['next_cursor']
+        if not cursor:
+            break
+        response = client.get('/records/data', query_string={'cursor': cursor})
+    return response
+
+
+def download(path):
+    def call(client, i):
+        response = client.get(path)
+        response.get_data()  # drain streamed bodies
+        return response
+    return call
+
+
+def build_routes(include_pdf):
+    routes = [
+        Route('submit_attendance', 'student', submit),
+        Route('records', 'lecturer', records_page),
+        Route('records_data', 'lecturer', records_data),
+        Route('download_csv', 'lecturer', download('/download/all/csv')),
+    ]
+    if include_pdf:
+        routes.append(Route('download_pdf', 'lecturer', download('/download/all/pdf')))
+    return routes
+
+
+class Driver:
+    def __init__(self, students, app=None, base_url=None):
+        # In-process through app's test client, or over HTTP to base_url
+        self.app = app
+        self.base_url = base_url
+        self.students = students
+        self._local = threading.local()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def next_index(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def new_client(self):
+        if self.app is not None:
+            return self.app.test_client()
+        return HttpClient(self.base_url)
+
+    def client(self, role):
+        # One logged-in client per thread and role
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        if role not in clients:
+            client = self.new_client()
+            index = self.next_index() % self.students
+            # Setup logins retry when rate limited or shed, so the measured
+            # requests run as a logged-in user
+            while True:
+                if role == 'lecturer':
+                    response = client.post('/login', data={'username': 'lecturer', 'password': 'bench'})
+                else:
+                    response = login(client, index)
+                # Throttled form posts redirect to the form with Retry-After
+                if 'Retry-After' not in response.headers:
+                    break
+                time.sleep(float(response.headers.get('Retry-After', 1)))
+            clients[role] = client
+        return clients[role]
+
+    def timed(self, route, i, client=None):
+        client = client or self.client(route.role)
+        started = time.perf_counter()
+        response = route.call(client, i)
+        elapsed = time.perf_counter() - started
+        return route.name, elapsed, response.status_code < 400
+
+
+def summarize(samples, elapsed, peak_rss_mb=None):
+    report = {}
+    for name in sorted({name for name, _, _ in samples}):
+        latencies = [latency for sample_name, latency, _ in samples if sample_name == name]
+        errors = sum(1 for sample_name, _, ok in samples if sample_name == name and not ok)
+        report[name] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput_per_s': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'latency_ms': latency_summary(latencies),
+            'peak_rss_mb': round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+        }
+    return report
+
+
+def run_isolated(driver, routes, requests_per_route, burst, concurrency):
+    report = {}
+    login_route = Route('login', 'student', login)
+    phases = [(login_route, burst)] + [(route, burst if route.name == 'submit_attendance'
+                                        else requests_per_route) for route in routes]
+    for route, count in phases:
+        with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            if route is login_route:
+                samples = list(pool.map(lambda i: driver.timed(route, i, driver.new_client()),
+                                        range(count)))
+            else:
+                samples = list(pool.map(lambda i: driver.timed(route, i), range(count)))
+            elapsed = time.perf_counter() - started
+        report.update(summarize(samples, elapsed, rss.peak_mb if driver.app else None))
+    return report
+
+
+def run_mixed(driver, routes, requests_per_route, burst, concurrency):
+    login_route = Route('login', 'student', login)
+    submit_route = next(route for route in routes if route.name == 'submit_attendance')
+    readers = [route for route in routes if route is not submit_route]
+
+    def student_session(i):
+        # A fresh student: log in, then submit once
+        client = driver.new_client()
+        return [driver.timed(login_route, i, client), driver.timed(submit_route, i, client)]
+
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        futures = [pool.submit(student_session, i) for i in range(burst)]
+        for route in readers:
+            futures += [pool.submit(lambda r=route, i=i: [driver.timed(r, i)])
+                        for i in range(requests_per_route)]
+        samples = [sample for future in futures for sample in future.result()]
+        elapsed = time.perf_counter() - started
+    return summarize(samples, elapsed, rss.peak_mb if driver.app else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=20000, help='seeded StudentRecord rows')
+    parser.add_argument('--attendance', type=int, default=20000, help='seeded Attendance rows')
+    parser.add_argument('--burst', type=int, default=300, help='students in the submission burst')
+    parser.add_argument('--requests', type=int, default=20, help='requests per read/export route')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads')
+    parser.add_argument('--pdf', action='store_true', help='include the synchronous PDF export')
+    parser.add_argument('--phase', choices=['isolated', 'mixed', 'both'], default='both')
+    parser.add_argument('--gunicorn', action='store_true', help='serve through gunicorn instead of in-process')
+    parser.add_argument('--port', type=int, default=8765, help='port for --gunicorn')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='attendance-load-')
+    database_url = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    app_module = load_app({'DATABASE_URL': database_url})
+    seed(app_module, args.records, args.attendance, students=args.burst)
+
+    server = None
+    if args.gunicorn:
+        server = start_gunicorn(database_url, args.port)
+        driver = Driver(args.burst, base_url=f'http://127.0.0.1:{args.port}')
+    else:
+        driver = Driver(args.burst, app=app_module.app)
+    routes = build_routes(args.pdf)
+    report = {
+        'config': {
+            'records': args.records,
+            'attendance': args.attendance,
+            'burst': args.burst,
+            'requests_per_route': args.requests,
+            'concurrency': args.concurrency,
+            'database': app_module.app.config['SQLALCHEMY_DATABASE_URI'],
+            'server': (f"gunicorn {os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')}"
+                       if args.gunicorn else 'in-process'),
+        },
+    }
+    try:
+        if args.phase in ('isolated', 'both'):
+            report['isolated'] = run_isolated(driver, routes, args.requests, args.burst, args.concurrency)
+        if args.phase in ('mixed', 'both'):
+            report['mixed'] = run_mixed(driver, routes, args.requests, args.burst, args.concurrency)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""PDF export benchmark: one big table vs chunked tables vs per-course bundle.
+
+Seeds a scratch SQLite database with ``--records`` StudentRecord rows spread
+over ``--courses`` courses, then renders every record three ways:
+
+* single_table: the old export, one ReportLab Table over ORM objects
+* chunked: build_records_pdf, PDF_CHUNK_ROWS-row tables over plain rows
+* bundle: build_records_pdf_bundle, one PDF per course rendered across
+  PDF_WORKERS processes and zipped
+
+and prints seconds, rows/second, output size and peak RSS (of this process;
+bundle workers are separate processes) for each as JSON.
+
+    python benchmarks/pdf_export_bench.py --records 10000 --courses 8 --workers 4
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import RssSampler, load_app
+
+
+def seed(app_module, records, courses):
+    from sqlalchemy import insert
+    from models import StudentRecord
+    app, db = app_module.app, app_module.db
+    with app.app_context():
+        db.create_all()
+        start = datetime.now() - timedelta(days=120)
+        rows = [{
+            'name': f'Seed Student {i}',
+            'matric_no': f'S{i:07d}',
+            'course': f'URP {101 + i % courses}',
+            'timestamp': start + timedelta(seconds=i * 30),
+            'latitude': 8.4799 + (i % 100) * 1e-5,
+            'longitude': 8.5156 + (i % 100) * 1e-5,
+            'accuracy': 10 + i % 40,
+            'location_name': 'Faculty of Environmental Sciences',
+        } for i in range(records)]
+        for offset in range(0, records, 5000):
+            db.session.execute(insert(StudentRecord), rows[offset:offset + 5000])
+        db.session.commit()
+
+
+def single_table_pdf(app_module, output):
+    # The export as it was: every record in one Table, styles rebuilt per call
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+    from models import StudentRecord
+    from pdf_export import PDF_EXPORT_COL_WIDTHS, PDF_EXPORT_HEADER, record_pdf_row
+    all_records = StudentRecord.query.order_by(StudentRecord.timestamp.desc()).all()
+    doc = SimpleDocTemplate(output, pagesize=letter, rightMargin=30, leftMargin=30,
+                            topMargin=30, bottomMargin=30)
+    data = [PDF_EXPORT_HEADER]
+    data.extend(record_pdf_row(idx, record) for idx, record in enumerate(all_records, 1))
+    table = Table(data, colWidths=PDF_EXPORT_COL_WIDTHS, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ecf0f1')),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#bdc3c7')),
+        ('FONTSIZE', (0, 1), (-1, -1), 7),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    styles = getSampleStyleSheet()
+    doc.build([Paragraph('<b>STUDENT ATTENDANCE RECORDS WITH LOCATION DATA</b>', styles['Title']), table])
+
+
+def chunked_pdf(app_module, output):
+    from exports import build_records_pdf, records_pdf_query
+    query = records_pdf_query({})
+    build_records_pdf(app_module.db.session.execute(query), output)
+
+
+def bundle_pdf(app_module, output):
+    from exports import build_records_pdf_bundle
+    build_records_pdf_bundle({}, output)
+
+
+def run_mode(app_module, name, render, records):
+    output = io.BytesIO()
+    with app_module.app.app_context():
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            render(app_module, output)
+            elapsed = time.perf_counter() - started
+    return {
+        'mode': name,
+        'records': records,
+        'elapsed_s': round(elapsed, 3),
+        'rows_per_s': round(records / elapsed, 1),
+        'output_kb': round(len(output.getvalue()) / 1024, 1),
+        'peak_rss_mb': round(rss.peak_mb, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--courses', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4, help='PDF_WORKERS for the bundle')
+    parser.add_argument('--chunk-rows', type=int, default=250, help='PDF_CHUNK_ROWS')
+    parser.add_argument('--skip-single-table', action='store_true',
+                        help='skip the old export, which gets very slow past ~20k rows')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='attendance-pdf-bench-')
+    app_module = load_app({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'REPORT_DIR': os.path.join(workdir, 'reports'),
+        'PDF_WORKERS': str(args.workers),
+        'PDF_CHUNK_ROWS': str(args.chunk_rows),
+    })
+    seed(app_module, args.records, args.courses)
+
+    modes = [('chunked', chunked_pdf), ('bundle', bundle_pdf)]
+    if not args.skip_single_table:
+        modes.insert(0, ('single_table', single_table_pdf))
+    report = [run_mode(app_module, name, render, args.records) for name, render in modes]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
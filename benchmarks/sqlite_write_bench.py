@@ -0,0 +1,107 @@
+"""Concurrent attendance submission benchmark for the SQLite write path.
+
+Starts several processes (standing in for gunicorn workers) that log in as
+students and fire /submit_attendance at the same database file, once with the
+SQLite tuning disabled (the old defaults) and once with it enabled, and prints
+throughput, latency and "database is locked" failures for each as JSON.
+
+    python benchmarks/sqlite_write_bench.py --workers 8 --submissions 100
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from bench_utils import latency_summary, load_app
+
+
+def prepare_database(env, workers):
+    app_module = load_app(env)
+    from werkzeug.security import generate_password_hash
+    from models import User
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        for worker in range(workers):
+            app_module.db.session.add(User(
+                username=f'bench{worker}', password=generate_password_hash('bench'), role='student'))
+        app_module.db.session.commit()
+
+
+def run_worker(env, worker, submissions, barrier, results):
+    app_module = load_app(env)
+    client = app_module.app.test_client()
+    client.post('/login', data={'username': f'bench{worker}', 'password': 'bench'})
+
+    latencies = []
+    errors = 0
+    barrier.wait()
+    for i in range(submissions):
+        started = time.perf_counter()
+        response = client.post('/submit_attendance', data={
+            'name': f'Student {worker}-{i}',
+            'matric_no': f'B{worker:03d}{i:05d}',
+            'course': 'URP 301',
+            'latitude': '8.4799',
+            'longitude': '8.5156',
+            'accuracy': '12',
+        }, headers={'X-Requested-With': 'XMLHttpRequest'})
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors += 1
+    results.put((latencies, errors))
+
+
+def run_mode(name, tuning, workers, submissions):
+    workdir = tempfile.mkdtemp(prefix=f'attendance-bench-{name}-')
+    env = {
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'SQLITE_TUNING': '1' if tuning else '0',
+    }
+    ctx = multiprocessing.get_context('spawn')
+    setup = ctx.Process(target=prepare_database, args=(env, workers))
+    setup.start()
+    setup.join()
+
+    barrier = ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=run_worker, args=(env, worker, submissions, barrier, results))
+             for worker in range(workers)]
+    for proc in procs:
+        proc.start()
+    barrier.wait()
+    started = time.perf_counter()
+    collected = [results.get() for _ in procs]
+    elapsed = time.perf_counter() - started
+    for proc in procs:
+        proc.join()
+
+    latencies = [value for worker_latencies, _ in collected for value in worker_latencies]
+    errors = sum(worker_errors for _, worker_errors in collected)
+    return {
+        'mode': name,
+        'workers': workers,
+        'submissions': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round((len(latencies) - errors) / elapsed, 1),
+        'latency_ms': latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--submissions', type=int, default=100, help='submissions per worker')
+    args = parser.parse_args()
+
+    report = [
+        run_mode('default', False, args.workers, args.submissions),
+        run_mode('tuned', True, args.workers, args.submissions),
+    ]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Worker startup benchmark: import time and first-request latency.
+
+Starts a fresh interpreter per run (as a new gunicorn worker would), imports
+the app, creates the schema and serves GET /login, and prints the medians
+as JSON along with which heavy libraries were loaded by then. --baseline
+runs the same probe against another git revision checked out to a temp
+directory, for a before/after comparison.
+
+    python benchmarks/startup_bench.py --runs 10 --baseline HEAD~1
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('numpy', 'reportlab', 'alembic', 'flask_migrate')
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+with app_module.app.app_context():
+    app_module.db.create_all()
+response = app_module.app.test_client().get('/login')
+served = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - started,
+    'first_request_s': served - imported,
+    'status': response.status_code,
+    'loaded': [name for name in %r if name in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def probe(tree, workdir):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}")
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=tree, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(label, tree, runs):
+    samples = []
+    with tempfile.TemporaryDirectory(prefix='attendance-startup-bench-') as workdir:
+        probe(tree, workdir)  # warm the bytecode and OS file caches
+        for _ in range(runs):
+            samples.append(probe(tree, workdir))
+    return {
+        'tree': label,
+        'runs': runs,
+        'import_ms': round(statistics.median(s['import_s'] for s in samples) * 1000, 1),
+        'first_request_ms': round(statistics.median(s['first_request_s'] for s in samples) * 1000, 1),
+        'status': samples[-1]['status'],
+        'heavy_modules_loaded': samples[-1]['loaded'],
+    }
+
+
+def export_revision(revision, directory):
+    archive = subprocess.run(['git', 'archive', revision], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--baseline', help='git revision to compare against, e.g. HEAD~1')
+    args = parser.parse_args()
+
+    report = []
+    if args.baseline:
+        with tempfile.TemporaryDirectory(prefix='attendance-startup-baseline-') as tree:
+            export_revision(args.baseline, tree)
+            report.append(measure(args.baseline, tree, args.runs))
+    report.append(measure('working tree', ROOT, args.runs))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
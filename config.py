@@ -0,0 +1,197 @@
+"""Application settings, read from the environment by create_app()."""
+import os
+import sqlite3
+
+# Route classes for request time budgets, by endpoint or blueprint; anything
+# not listed is 'read'. 'stream' has no budget: it holds the connection open.
+ROUTE_CLASSES = {
+    'attendance.attendance': 'submit',
+    'attendance.submit_attendance': 'submit',
+    'attendance.submit_attendance_bulk': 'bulk',
+    'attendance.upload_roster': 'bulk',
+    'records.records_stream': 'stream',
+    'exports': 'bulk',
+}
+
+# Rate-limited endpoints (POSTs only) and the config prefix of their limits;
+# endpoints with the same prefix share buckets
+RATE_LIMITED = {
+    'auth.login': 'LOGIN',
+    'attendance.attendance': 'SUBMIT',
+    'attendance.submit_attendance': 'SUBMIT',
+}
+
+# Page a refused form post is sent back to; POST-only endpoints can't be
+# redirected to themselves
+RATE_LIMIT_FORM_PAGES = {
+    'auth.login': 'auth.login',
+    'attendance.attendance': 'attendance.attendance',
+    'attendance.submit_attendance': 'attendance.attendance',
+}
+
+
+def load_config(app):
+    # Database configuration
+    app.config['SECRET_KEY'] = 'your-secret-key-here'  # Should be a long, random string
+    # Set DATABASE_URL to use Postgres (or another DB) instead of the local SQLite file
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///attendance.db').replace(
+        'postgres://', 'postgresql://', 1)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['WTF_CSRF_ENABLED'] = True
+
+    # SQLite write-path tuning, applied to every new connection (SQLITE_TUNING=0 disables)
+    app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') not in ('0', 'false', 'no')
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+    app.config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+
+    # Connection pool sizing for server databases (ignored for SQLite)
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+    # Background report jobs
+    app.config['REPORT_DIR'] = os.environ.get('REPORT_DIR', os.path.join(app.instance_path, 'reports'))
+    app.config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', 2))
+    app.config['REPORT_WORKER_MODE'] = os.environ.get('REPORT_WORKER_MODE', 'process')  # or 'thread'
+    # A job still queued or running this long after it was created is reported
+    # failed (its worker died or was restarted)
+    app.config['REPORT_JOB_TIMEOUT_MINUTES'] = int(os.environ.get('REPORT_JOB_TIMEOUT_MINUTES', 60))
+
+    # Semester archive: closed semesters move out of the live tables into
+    # columnar files here. Semesters start on the 1st of these months.
+    app.config['ARCHIVE_DIR'] = os.environ.get('ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+    app.config['SEMESTER_START_MONTHS'] = os.environ.get('SEMESTER_START_MONTHS', '9,3')
+
+    # PDF exports: rows per table chunk, rows per file in a zip bundle, and the
+    # pool that renders bundle files in parallel (uses REPORT_WORKER_MODE too)
+    app.config['PDF_CHUNK_ROWS'] = int(os.environ.get('PDF_CHUNK_ROWS', 250))
+    app.config['PDF_FILE_ROWS'] = int(os.environ.get('PDF_FILE_ROWS', 5000))
+    app.config['PDF_WORKERS'] = int(os.environ.get('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+
+    # Generated CSV/PDF downloads are kept on disk, keyed by the rows they cover;
+    # least recently used files go first once the directory passes the limit (0 disables)
+    app.config['EXPORT_CACHE_DIR'] = os.environ.get('EXPORT_CACHE_DIR', os.path.join(app.instance_path, 'export_cache'))
+    app.config['EXPORT_CACHE_MAX_MB'] = int(os.environ.get('EXPORT_CACHE_MAX_MB', 256))
+
+    # Group commit for /submit_attendance: queue submissions and commit them in batches
+    app.config['GROUP_COMMIT_ENABLED'] = os.environ.get('GROUP_COMMIT_ENABLED', '0') in ('1', 'true', 'yes')
+    app.config['GROUP_COMMIT_MAX_BATCH'] = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 100))
+    app.config['GROUP_COMMIT_MAX_DELAY_MS'] = int(os.environ.get('GROUP_COMMIT_MAX_DELAY_MS', 20))
+    app.config['GROUP_COMMIT_TIMEOUT'] = int(os.environ.get('GROUP_COMMIT_TIMEOUT', 10))
+
+    # Request/SQL instrumentation and the /metrics endpoint (off unless enabled)
+    app.config['INSTRUMENTATION_ENABLED'] = os.environ.get('INSTRUMENTATION_ENABLED', '0') in ('1', 'true', 'yes')
+    app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+    app.config['SLOW_REQUEST_SECONDS'] = float(os.environ.get('SLOW_REQUEST_SECONDS', 2.0))
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # unset: /metrics answers localhost only
+
+    # Time budget per route class (ROUTE_CLASSES), in seconds; 0 disables
+    app.config['REQUEST_TIMEOUT_SUBMIT'] = float(os.environ.get('REQUEST_TIMEOUT_SUBMIT', 10))
+    app.config['REQUEST_TIMEOUT_READ'] = float(os.environ.get('REQUEST_TIMEOUT_READ', 30))
+    app.config['REQUEST_TIMEOUT_BULK'] = float(os.environ.get('REQUEST_TIMEOUT_BULK', 120))
+
+    # Token-bucket limits for RATE_LIMITED routes, per user, IP and process ("count/period",
+    # empty turns one off). Per-IP limits are generous: a lecture hall shares campus NAT
+    app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1') not in ('0', 'false', 'no')
+    app.config['RATE_LIMIT_BACKEND'] = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # or 'module:factory'
+    app.config['LOGIN_LIMIT_USER'] = os.environ.get('LOGIN_LIMIT_USER', '10/minute')
+    app.config['LOGIN_LIMIT_IP'] = os.environ.get('LOGIN_LIMIT_IP', '300/minute')
+    app.config['LOGIN_LIMIT_GLOBAL'] = os.environ.get('LOGIN_LIMIT_GLOBAL', '30/second')
+    app.config['SUBMIT_LIMIT_USER'] = os.environ.get('SUBMIT_LIMIT_USER', '10/minute')
+    app.config['SUBMIT_LIMIT_IP'] = os.environ.get('SUBMIT_LIMIT_IP', '600/minute')
+    app.config['SUBMIT_LIMIT_GLOBAL'] = os.environ.get('SUBMIT_LIMIT_GLOBAL', '100/second')
+
+    # Admission control for the same routes, per process: requests running at once, requests
+    # allowed to wait and for how long (0 active disables). Keep active + waiting below
+    # GUNICORN_THREADS so page loads still get a thread during a burst. Group commit
+    # takes the submit endpoint out of the gate (admission_exempt below)
+    app.config['ADMISSION_MAX_ACTIVE'] = int(os.environ.get('ADMISSION_MAX_ACTIVE', 4))
+    app.config['ADMISSION_MAX_WAITING'] = int(os.environ.get('ADMISSION_MAX_WAITING', 2))
+    app.config['ADMISSION_WAIT_SECONDS'] = float(os.environ.get('ADMISSION_WAIT_SECONDS', 3))
+
+    # Per-process cache of logged-in users so @login_required skips the user table
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 60))
+
+    # Length of an attendance session window; one submission per student/course/window
+    app.config['SESSION_WINDOW_MINUTES'] = int(os.environ.get('SESSION_WINDOW_MINUTES', 60))
+    # Lecture sessions: default length and how long the open-session list is cached
+    app.config['LECTURE_SESSION_MINUTES'] = int(os.environ.get('LECTURE_SESSION_MINUTES', 60))
+    app.config['OPEN_SESSION_CACHE_TTL'] = float(os.environ.get('OPEN_SESSION_CACHE_TTL', 30))
+    # Course catalog: whether student submissions may add unknown courses (turn off
+    # once lecturers have added theirs by creating sessions, importing rosters or
+    # with `flask add-course`), and how close a misspelt department code must be
+    # to match an existing course (1 = off)
+    app.config['COURSE_AUTO_CREATE'] = os.environ.get('COURSE_AUTO_CREATE', '1') in ('1', 'true', 'yes')
+    app.config['COURSE_FUZZY_CUTOFF'] = float(os.environ.get('COURSE_FUZZY_CUTOFF', 0.8))
+    # Unknown codes reload the catalog (for courses other processes added) at most this often
+    app.config['COURSE_RELOAD_SECONDS'] = float(os.environ.get('COURSE_RELOAD_SECONDS', 5))
+    # Student roster: whether submissions for a course with an imported roster must
+    # come from an enrolled matric number, and how long each process keeps its copy
+    app.config['ROSTER_ENFORCE'] = os.environ.get('ROSTER_ENFORCE', '1') in ('1', 'true', 'yes')
+    app.config['ROSTER_CACHE_TTL'] = float(os.environ.get('ROSTER_CACHE_TTL', 60))
+
+    # Live records dashboard: how long one SSE response lasts before the browser
+    # reconnects, how often it checks for changes, and how long changes are kept
+    app.config['LIVE_STREAM_SECONDS'] = int(os.environ.get('LIVE_STREAM_SECONDS', 30))
+    app.config['LIVE_POLL_SECONDS'] = float(os.environ.get('LIVE_POLL_SECONDS', 1))
+    app.config['RECORD_CHANGE_RETENTION_HOURS'] = int(os.environ.get('RECORD_CHANGE_RETENTION_HOURS', 24))
+    # Geofence checks: metres of leeway past the fence, and the worst GPS accuracy worth judging
+    app.config['GEOFENCE_SLACK_M'] = float(os.environ.get('GEOFENCE_SLACK_M', 25))
+    app.config['GEOFENCE_MAX_ACCURACY_M'] = float(os.environ.get('GEOFENCE_MAX_ACCURACY_M', 500))
+
+    # Reverse geocoding: names are looked up per grid cell and kept in geocode_cell.
+    # Providers are tried in order: 'gazetteer', 'nominatim' or 'module:factory'.
+    app.config['GEOCODER_PROVIDERS'] = os.environ.get('GEOCODER_PROVIDERS', 'gazetteer,nominatim')
+    app.config['GEOCODER_GAZETTEER'] = os.environ.get('GEOCODER_GAZETTEER', os.path.join(app.instance_path, 'gazetteer.json'))
+    app.config['GEOCODER_NOMINATIM_URL'] = os.environ.get('GEOCODER_NOMINATIM_URL', 'https://nominatim.openstreetmap.org/reverse')
+    app.config['GEOCODER_USER_AGENT'] = os.environ.get('GEOCODER_USER_AGENT', 'nsuk-urp-attendance/1.0')
+    app.config['GEOCODER_TIMEOUT'] = float(os.environ.get('GEOCODER_TIMEOUT', 3))
+    app.config['GEOCODE_CELL_METERS'] = int(os.environ.get('GEOCODE_CELL_METERS', 50))
+    app.config['GEOCODE_CACHE_MAX_CELLS'] = int(os.environ.get('GEOCODE_CACHE_MAX_CELLS', 50000))
+    app.config['GEOCODE_CACHE_DAYS'] = int(os.environ.get('GEOCODE_CACHE_DAYS', 30))
+    app.config['GEOCODE_MISS_MINUTES'] = int(os.environ.get('GEOCODE_MISS_MINUTES', 10))  # retry unnamed cells after
+
+
+def build_engine_options(config):
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        if not config['SQLITE_TUNING']:
+            return {}
+        # pysqlite's own lock wait, in seconds; busy_timeout below covers the rest
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def admission_exempt(config):
+    # With group commit on, a batch only fills with the submissions in flight at
+    # once, so the admission gate would cap every batch at ADMISSION_MAX_ACTIVE
+    # rows. The submit endpoint skips the gate then; each waiting submission still
+    # holds a thread, so GUNICORN_THREADS bounds a batch, and rate limits apply
+    if config['GROUP_COMMIT_ENABLED']:
+        return ('attendance.submit_attendance',)
+    return ()
+
+
+def set_sqlite_pragmas(config, dbapi_connection, connection_record):
+    # 'connect' listener for SQLite engines; create_app() binds config
+    if not isinstance(dbapi_connection, sqlite3.Connection) or not config['SQLITE_TUNING']:
+        return
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers keep going while a submission commits, and
+    # synchronous=NORMAL only fsyncs at checkpoints instead of every commit
+    cursor.execute(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+    cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+    cursor.execute(f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT_MS']}")
+    cursor.execute(f"PRAGMA cache_size=-{config['SQLITE_CACHE_SIZE_KB']}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
@@ -0,0 +1,106 @@
+"""Course code canonicalisation and an in-process course catalog.
+
+Course codes are typed by hand ('csc301', 'CSC 301 ', 'Csc-301'), so they
+are canonicalised before they are stored: upper case, single spaces, and
+one space between the department letters and the number ('CSC 301').
+Anything that doesn't look like letters plus a number is only upper-cased
+and re-spaced.
+
+CourseCatalog maps canonical codes to course ids. It loads the whole
+catalog once per process and answers from a dict after that. A code it
+doesn't know is re-checked against the database (another process may have
+added it) before one is created, but the catalog is reloaded at most once
+per ``reload_interval`` seconds, so a stream of unknown codes doesn't read
+the whole table per request. Near misses with the same number, such as
+'CS 301' for 'CSC 301', are matched when the department letters are close
+enough (difflib ratio >= fuzzy_cutoff) and only one course qualifies.
+"""
+import difflib
+import re
+import threading
+import time
+
+CODE_RE = re.compile(r'^([A-Z]+)\s*[-/.]?\s*(\d+[A-Z]?)$')
+
+
+def canonical_course_code(raw):
+    text = ' '.join(str(raw or '').upper().split())
+    match = CODE_RE.match(text)
+    if match:
+        return f'{match.group(1)} {match.group(2)}'
+    return text
+
+
+class CourseCatalog:
+    def __init__(self, load, create, fuzzy_cutoff=0.8, reload_interval=5.0):
+        # load() -> {code: id} for every course; create(code) -> new id
+        self._load = load
+        self._create = create
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.reload_interval = reload_interval
+        self._codes = None
+        self._loaded_at = float('-inf')
+        self._by_number = {}  # course number -> [(letters, code)]
+        self._lock = threading.Lock()
+
+    def _catalog(self):
+        with self._lock:
+            if self._codes is None:
+                self._codes = {}
+                self._by_number = {}
+                for code, course_id in self._load().items():
+                    self._add(code, course_id)
+                self._loaded_at = time.monotonic()
+            return self._codes
+
+    def _add(self, code, course_id):
+        self._codes[code] = course_id
+        match = CODE_RE.match(code)
+        if match:
+            self._by_number.setdefault(match.group(2), []).append((match.group(1), code))
+
+    def _fuzzy(self, code):
+        match = CODE_RE.match(code)
+        if not match or self.fuzzy_cutoff >= 1:
+            return None
+        letters, number = match.groups()
+        scored = sorted(((difflib.SequenceMatcher(None, letters, other).ratio(), other_code)
+                         for other, other_code in self._by_number.get(number, ())), reverse=True)
+        if not scored or scored[0][0] < self.fuzzy_cutoff:
+            return None
+        if len(scored) > 1 and scored[1][0] == scored[0][0]:
+            return None  # ambiguous
+        return scored[0][1]
+
+    def lookup(self, raw, fuzzy=True):
+        # (id, code) for a known course, else (None, canonical code)
+        code = canonical_course_code(raw)
+        codes = self._catalog()
+        if code in codes:
+            return codes[code], code
+        match = self._fuzzy(code) if fuzzy else None
+        if match:
+            return codes[match], match
+        return None, code
+
+    def resolve(self, raw, create=True, fuzzy=True):
+        # Like lookup(), but reloads on a miss (if the catalog is older than
+        # reload_interval) and optionally creates the course
+        course_id, code = self.lookup(raw, fuzzy)
+        if course_id is None and code:
+            if time.monotonic() - self._loaded_at >= self.reload_interval:
+                self.invalidate()
+                course_id, code = self.lookup(raw, fuzzy)
+            if course_id is None and create:
+                course_id = self._create(code)
+                with self._lock:
+                    if self._codes is not None:
+                        self._add(code, course_id)
+        return course_id, code
+
+    def codes(self):
+        return dict(self._catalog())
+
+    def invalidate(self):
+        with self._lock:
+            self._codes = None
@@ -0,0 +1,67 @@
+"""In-process index of recent attendance submissions.
+
+Submissions are unique per (course, session window, matric number); the
+database enforces that with a unique index. SubmissionIndex keeps the keys
+for the most recent windows in memory, so the submit path can reject a
+repeat without a query. Each window is loaded from the database once, the
+first time it is checked. Keys written by other processes are not seen
+until that process reloads the window, which is why the unique index (and
+the IntegrityError it raises) stays the final word. Keys whose records
+another process deleted are still in the set, so a hit is only a hint:
+``confirm`` re-checks it in the database before the repeat is rejected.
+"""
+import threading
+from datetime import timedelta
+
+
+def session_window_start(timestamp, minutes):
+    # Windows are aligned to midnight, e.g. 08:00-09:00, 09:00-10:00 for 60
+    midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = (timestamp - midnight) // timedelta(minutes=minutes)
+    return midnight + timedelta(minutes=elapsed * minutes)
+
+
+class SubmissionIndex:
+    def __init__(self, load_window, keep_windows=2, confirm=None):
+        # load_window(window) -> iterable of (course, matric_no) already stored;
+        # confirm(window, course, matric_no) -> whether that key is still stored
+        self.load_window = load_window
+        self.keep_windows = keep_windows
+        self.confirm = confirm
+        self._windows = {}  # window start -> set of (course, matric_no)
+        self._lock = threading.Lock()
+
+    def _keys_for(self, window):
+        keys = self._windows.get(window)
+        if keys is None:
+            keys = self._windows[window] = set(self.load_window(window))
+            for stale in sorted(self._windows)[:-self.keep_windows]:
+                del self._windows[stale]
+        return keys
+
+    def seen(self, window, course, matric_no):
+        with self._lock:
+            hit = (course, matric_no) in self._keys_for(window)
+        if not hit or self.confirm is None:
+            return hit
+        # Outside the lock: misses, the common case, shouldn't wait on a query
+        if self.confirm(window, course, matric_no):
+            return True
+        self.discard(window, course, matric_no)
+        return False
+
+    def add(self, window, course, matric_no):
+        with self._lock:
+            keys = self._windows.get(window)
+            if keys is not None:
+                keys.add((course, matric_no))
+
+    def discard(self, window, course, matric_no):
+        with self._lock:
+            keys = self._windows.get(window)
+            if keys is not None:
+                keys.discard((course, matric_no))
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
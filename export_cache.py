@@ -0,0 +1,111 @@
+"""On-disk cache for generated export files, bounded by total size.
+
+Entries are named by a caller-supplied key (a hash of what the file was
+built from), so an unchanged key means the cached file is still right and a
+new key simply misses. Hits bump the file's mtime; when the directory grows
+past ``max_bytes`` the least recently used files are deleted first. Every
+process sharing the directory sees the same entries and LRU order.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+SUFFIX = '.export'
+
+
+def cache_key(*parts):
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+class ExportCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key):
+        # Path of the cached file, or None
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def write(self, key, fill):
+        # fill(f) writes the export into the open binary file f
+        tmp_path, f = self._open_tmp()
+        try:
+            with f:
+                fill(f)
+        except BaseException:
+            self._discard(tmp_path)
+            raise
+        return self._commit(tmp_path, key)
+
+    def tee(self, key, chunks):
+        # Yields chunks (bytes) unchanged while copying them into the cache;
+        # the entry only appears if the whole stream was consumed
+        tmp_path, f = self._open_tmp()
+        try:
+            with f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+        except BaseException:
+            self._discard(tmp_path)
+            raise
+        self._commit(tmp_path, key)
+
+    def evict(self, keep=None):
+        # Drop least recently used entries until the cache fits max_bytes;
+        # keep (a path) is never dropped, even if it alone is too big
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                self._discard(path)
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(SUFFIX):
+                    self._discard(entry.path)
+
+    def _open_tmp(self):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=self.directory)
+        return tmp_path, os.fdopen(fd, 'wb')
+
+    def _commit(self, tmp_path, key):
+        path = self.path(key)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
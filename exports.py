@@ -0,0 +1,524 @@
+"""CSV and PDF downloads, the export cache and background report jobs."""
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+
+from flask import Blueprint, Response, request, redirect, url_for, flash, jsonify, send_file, current_app, stream_with_context
+from flask_login import login_required, current_user
+from sqlalchemy import select, update
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import secure_filename
+
+from export_cache import ExportCache, cache_key
+from extensions import db
+from geocoding import SingleFlight
+from models import RecordChange, ReportJob, StudentRecord
+from records import filter_records_query, iter_archived_records, parse_record_filters, record_archive
+
+bp = Blueprint('exports', __name__)
+
+
+# CSV export helpers
+CSV_EXPORT_BATCH_SIZE = 500
+CSV_EXPORT_HEADER = [
+    'No.', 'Name', 'Matric Number', 'Course',
+    'Date', 'Time', 'Status', 'Latitude', 
+    'Longitude', 'Accuracy', 'Location Name', 'Record ID'
+]
+
+
+def record_csv_row(idx, record):
+    return [
+        idx,
+        record.name,
+        record.matric_no,
+        record.course,
+        record.timestamp.strftime('%Y-%m-%d'),
+        record.timestamp.strftime('%H:%M:%S'),
+        'Active' if record.active else 'Inactive',
+        record.latitude if record.latitude else 'N/A',
+        record.longitude if record.longitude else 'N/A',
+        record.accuracy if record.accuracy else 'N/A',
+        record.location_name if record.location_name else 'N/A',
+        record.id
+    ]
+
+
+def iter_records_csv(filters, batch_size=CSV_EXPORT_BATCH_SIZE):
+    # Rows are pulled from the database batch_size at a time and each batch
+    # is flushed out as one CSV chunk, so memory stays bounded by the batch
+    query = (filter_records_query(StudentRecord.query, filters)
+             .order_by(StudentRecord.timestamp.desc(), StudentRecord.id.desc())
+             .yield_per(batch_size))
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_EXPORT_HEADER)
+
+    records = chain(query, iter_archived_records(filters)) if filters.get('archive') else query
+    row_count = 0
+    for row_count, record in enumerate(records, 1):
+        writer.writerow(record_csv_row(row_count, record))
+        if row_count % batch_size == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+
+    if not row_count:
+        writer.writerow(['No attendance records found', '', '', '', '', '', '', '', '', '', ''])
+    yield output.getvalue()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# Export cache
+EXPORT_CACHE_LAYOUT = 1  # bump when the CSV/PDF layout changes so old files miss
+# directory and max_bytes: EXPORT_CACHE_DIR / EXPORT_CACHE_MAX_MB, set in create_app()
+export_cache = ExportCache(None, 0)
+export_flight = SingleFlight()
+
+
+def export_version(kind, filters, variant=''):
+    # Returns (cache key, last modified). Count, newest id and newest
+    # timestamp under the filter change with inserts and deletes; the newest
+    # change-feed id changes with in-place edits such as status toggles.
+    count, max_id, max_timestamp = db.session.execute(filter_records_query(
+        select(db.func.count(StudentRecord.id), db.func.max(StudentRecord.id),
+               db.func.max(StudentRecord.timestamp)), filters)).one()
+    change = db.session.execute(select(RecordChange.id, RecordChange.changed_at)
+                                .order_by(RecordChange.id.desc()).limit(1)).first()
+    key = cache_key(EXPORT_CACHE_LAYOUT, kind, variant,
+                    sorted((name, str(value)) for name, value in filters.items() if value),
+                    count, max_id, str(max_timestamp), change.id if change else 0,
+                    record_archive.generation() if filters.get('archive') else None)
+    modified = max((value for value in (max_timestamp, change and change.changed_at) if value), default=None)
+    # Stored times are local; HTTP dates are UTC
+    return key, modified.astimezone(timezone.utc) if modified else None
+
+
+def send_cached_export(path, key, modified, filename, mimetype):
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=filename,
+                     conditional=True, etag=key, last_modified=modified, max_age=0)
+
+
+def conditional_export(response, key, modified):
+    # A client that already holds this version gets a 304 and the body
+    # generator is never started
+    response.set_etag(key)
+    response.last_modified = modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+# Download CSV route
+@bp.route('/download/all/csv')
+@login_required
+def download_all_csv():
+    try:
+        filters = parse_record_filters(request.args)
+    except ValueError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('records.records'))
+
+    use_gzip = request.args.get('gzip') in ('1', 'true', 'yes')
+    filename = f"attendance_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    if use_gzip:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    else:
+        content_type = 'text/csv; charset=utf-8'
+
+    key, modified = export_version('csv', filters, 'gzip' if use_gzip else '')
+    path = export_cache.get(key) if export_cache.enabled else None
+    if path:
+        return send_cached_export(path, key, modified, filename, content_type.split(';')[0])
+
+    chunks = iter_records_csv(filters)
+    if use_gzip:
+        body = gzip_chunks(chunks)
+    else:
+        body = (chunk.encode('utf-8') for chunk in chunks)
+    if export_cache.enabled:
+        # Stream to the client and fill the cache in the same pass
+        body = export_cache.tee(key, body)
+
+    response = Response(
+        stream_with_context(body),
+        mimetype=content_type.split(';')[0],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Content-Type': content_type
+        }
+    )
+    return conditional_export(response, key, modified)
+
+
+# PDF export helpers
+# Only what a PDF row shows, selected as plain rows rather than ORM objects
+PDF_EXPORT_COLUMNS = (
+    StudentRecord.id, StudentRecord.name, StudentRecord.matric_no, StudentRecord.course,
+    StudentRecord.timestamp, StudentRecord.active, StudentRecord.latitude,
+    StudentRecord.longitude, StudentRecord.accuracy, StudentRecord.location_name
+)
+
+
+def records_pdf_query(filters):
+    return (filter_records_query(select(*PDF_EXPORT_COLUMNS), filters)
+            .order_by(StudentRecord.timestamp.desc(), StudentRecord.id.desc()))
+
+
+def records_pdf_rows(filters):
+    rows = db.session.execute(records_pdf_query(filters))
+    # Archived rows are all older than live ones, so they simply follow
+    return chain(rows, iter_archived_records(filters)) if filters.get('archive') else rows
+
+
+def build_records_pdf(all_records, output, title=None, start=1):
+    # ReportLab is imported on the first PDF export rather than at startup
+    from pdf_export import render_records_pdf
+    return render_records_pdf(all_records, output, title=title, start=start,
+                              chunk_rows=current_app.config['PDF_CHUNK_ROWS'])
+
+
+@bp.route('/download/all/pdf')
+@login_required
+def download_all_pdf():
+    try:
+        filters = parse_record_filters(request.args)
+    except ValueError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('records.records'))
+
+    try:
+        filename = f"attendance_records_with_location_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        key, modified = export_version('pdf', filters)
+        not_modified = conditional_export(Response(mimetype='application/pdf'), key, modified)
+        if not_modified.status_code == 304:
+            return not_modified
+
+        if export_cache.enabled:
+            def render(f):
+                build_records_pdf(records_pdf_rows(filters), f)
+            # Concurrent clicks for the same version wait for one render
+            path = export_cache.get(key) or export_flight.do(
+                key, lambda: export_cache.get(key) or export_cache.write(key, render))
+            return send_cached_export(path, key, modified, filename, 'application/pdf')
+
+        buffer = io.BytesIO()
+        build_records_pdf(records_pdf_rows(filters), buffer)
+
+        response = Response(
+            buffer.getvalue(),
+            mimetype='application/pdf',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Content-Type': 'application/pdf'
+            }
+        )
+        return conditional_export(response, key, modified)
+    except Exception as e:
+        current_app.logger.error(f"PDF export error: {str(e)}")
+        flash('Error generating PDF file', 'danger')
+        return redirect(url_for('records.records'))
+
+
+# The app that pool workers run under: the one this blueprint was registered
+# on, which forked workers inherit. Workers started any other way use the
+# module-level app.
+_worker_app = None
+
+
+@bp.record_once
+def remember_worker_app(state):
+    global _worker_app
+    _worker_app = state.app
+
+
+def worker_app():
+    if _worker_app is None:
+        from app import app
+        return app
+    return _worker_app
+
+
+# Per-course PDF bundles
+_pdf_executor = None
+_bundle_executor = None
+_pdf_executor_lock = threading.Lock()
+
+
+def get_pdf_executor():
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            workers = max(1, current_app.config['PDF_WORKERS'])
+            if current_app.config['REPORT_WORKER_MODE'] == 'thread':
+                _pdf_executor = ThreadPoolExecutor(max_workers=workers)
+            else:
+                _pdf_executor = ProcessPoolExecutor(max_workers=workers,
+                                                    initializer=_init_report_worker)
+        return _pdf_executor
+
+
+def get_bundle_executor():
+    # Bundle jobs only plan the parts and zip the results, so they run on
+    # threads in this process and hand the rendering to the PDF pool; a
+    # report pool worker can't cleanly own a process pool of its own
+    global _bundle_executor
+    with _pdf_executor_lock:
+        if _bundle_executor is None:
+            _bundle_executor = ThreadPoolExecutor(max_workers=current_app.config['REPORT_WORKERS'])
+        return _bundle_executor
+
+
+def pdf_bundle_parts(filters):
+    # One file per course, split every PDF_FILE_ROWS rows so a big course
+    # still spreads across workers. Returns (parts, max_id); max_id pins the
+    # row set so records arriving mid-export don't shift the part offsets.
+    max_id = db.session.execute(
+        filter_records_query(select(db.func.max(StudentRecord.id)), filters)).scalar()
+    if max_id is None:
+        return [], None
+
+    file_rows = max(1, current_app.config['PDF_FILE_ROWS'])
+    counts = db.session.execute(
+        filter_records_query(select(StudentRecord.course, db.func.count(StudentRecord.id)), filters)
+        .where(StudentRecord.id <= max_id)
+        .group_by(StudentRecord.course)
+        .order_by(StudentRecord.course)
+    ).all()
+
+    parts = []
+    used_names = set()
+    for course, count in counts:
+        stem = secure_filename(course) or 'course'
+        while stem in used_names:
+            stem += '_'
+        used_names.add(stem)
+        pages = range(0, count, file_rows)
+        for number, offset in enumerate(pages, 1):
+            name = f'{stem}.pdf' if len(pages) == 1 else f'{stem}_part{number}.pdf'
+            parts.append((course, offset, min(file_rows, count - offset), name))
+    return parts, max_id
+
+
+def render_pdf_part(raw_filters, max_id, course, offset, limit, path):
+    # Runs in a PDF worker; filters travel in their raw form so they pickle
+    with worker_app().app_context():
+        filters = parse_record_filters(raw_filters)
+        query = (records_pdf_query(filters)
+                 .where(StudentRecord.course == course, StudentRecord.id <= max_id)
+                 .offset(offset)
+                 .limit(limit))
+        with open(path, 'wb') as f:
+            build_records_pdf(db.session.execute(query), f,
+                              title=f'{course} Attendance Records', start=offset + 1)
+    return path
+
+
+def build_records_pdf_bundle(raw_filters, output):
+    # Renders one PDF per course (or course part) across the PDF pool and
+    # zips them in course order
+    parts, max_id = pdf_bundle_parts(parse_record_filters(raw_filters))
+    os.makedirs(current_app.config['REPORT_DIR'], exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix='pdf-', dir=current_app.config['REPORT_DIR'])
+    try:
+        if parts:
+            executor = get_pdf_executor()
+            futures = [executor.submit(render_pdf_part, raw_filters, max_id, course, offset, limit,
+                                       os.path.join(workdir, name))
+                       for course, offset, limit, name in parts]
+        else:
+            futures = []
+        # ReportLab already compresses page streams, so deflating again buys little
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as bundle:
+            for (course, offset, limit, name), future in zip(parts, futures):
+                bundle.write(future.result(), name)
+            if not parts:
+                buffer = io.BytesIO()
+                build_records_pdf([], buffer)
+                bundle.writestr('attendance_records.pdf', buffer.getvalue())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return len(parts)
+
+
+# Background report jobs
+REPORT_KINDS = ('pdf', 'csv', 'zip')  # 'zip' is one PDF per course
+REPORT_MIMETYPES = {'pdf': 'application/pdf', 'csv': 'text/csv', 'zip': 'application/zip'}
+REPORT_FILTER_KEYS = ('course', 'status', 'start_date', 'end_date', 'session_id', 'location', 'archive')
+_report_executor = None
+_report_executor_lock = threading.Lock()
+
+
+def _init_report_worker():
+    # Forked workers must not reuse the parent's pooled database connections
+    with worker_app().app_context():
+        db.engine.dispose(close=False)
+
+
+def get_report_executor():
+    global _report_executor
+    with _report_executor_lock:
+        if _report_executor is None:
+            workers = current_app.config['REPORT_WORKERS']
+            if current_app.config['REPORT_WORKER_MODE'] == 'thread':
+                _report_executor = ThreadPoolExecutor(max_workers=workers)
+            else:
+                _report_executor = ProcessPoolExecutor(max_workers=workers,
+                                                       initializer=_init_report_worker)
+        return _report_executor
+
+
+def run_report_job(job_id):
+    # Runs inside a pool worker; job state lives in the database so any
+    # web worker can answer status polls
+    with worker_app().app_context():
+        job = db.session.get(ReportJob, job_id)
+        if job is None or job.status != 'queued':
+            return
+        job.status = 'running'
+        db.session.commit()
+
+        tmp_path = None
+        try:
+            filters = parse_record_filters(json.loads(job.filters or '{}'))
+            os.makedirs(current_app.config['REPORT_DIR'], exist_ok=True)
+            path = os.path.join(current_app.config['REPORT_DIR'], f'{job.id}.{job.kind}')
+            tmp_path = path + '.part'
+
+            if job.kind == 'pdf':
+                with open(tmp_path, 'wb') as f:
+                    build_records_pdf(records_pdf_rows(filters), f)
+            elif job.kind == 'zip':
+                build_records_pdf_bundle(json.loads(job.filters or '{}'), tmp_path)
+            else:
+                with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                    for chunk in iter_records_csv(filters):
+                        f.write(chunk)
+
+            os.replace(tmp_path, path)
+            job.status = 'done'
+            job.file_path = path
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Report job {job_id} failed: {str(e)}", exc_info=True)
+            job.status = 'failed'
+            job.error = str(e)[:500]
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        job.finished_at = datetime.now()
+        db.session.commit()
+
+
+def report_job_to_dict(job):
+    data = {
+        'job_id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'filters': json.loads(job.filters or '{}'),
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': url_for('exports.report_status', job_id=job.id),
+        'download_url': None,
+        'error': job.error
+    }
+    if job.status == 'done':
+        data['download_url'] = url_for('exports.download_report', job_id=job.id)
+    return data
+
+
+def get_own_report_job(job_id):
+    job = db.session.get(ReportJob, job_id)
+    if job is None or job.user_id != current_user.id:
+        raise NotFound()
+    expire_stale_report_job(job)
+    return job
+
+
+def expire_stale_report_job(job):
+    # A job whose worker died (restart, OOM kill) would stay queued or
+    # running forever; the status check only fails it if it hasn't moved on
+    cutoff = datetime.now() - timedelta(minutes=current_app.config['REPORT_JOB_TIMEOUT_MINUTES'])
+    status = job.status
+    if status not in ('queued', 'running') or job.created_at > cutoff:
+        return
+    expired = db.session.execute(
+        update(ReportJob)
+        .where(ReportJob.id == job.id, ReportJob.status.in_(('queued', 'running')))
+        .values(status='failed', error='Report job did not finish in time', finished_at=datetime.now())
+    ).rowcount
+    db.session.commit()
+    if expired:
+        current_app.logger.warning(f"Report job {job.id} was still {status} after "
+                                   f"{current_app.config['REPORT_JOB_TIMEOUT_MINUTES']} minutes; marked failed")
+    db.session.refresh(job)
+
+
+@bp.route('/reports', methods=['POST'])
+@login_required
+def create_report():
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    data = request.get_json(silent=True) or request.form
+    kind = (data.get('kind') or 'pdf').lower()
+    if kind not in REPORT_KINDS:
+        return jsonify({'success': False, 'message': 'Report kind must be "pdf", "csv" or "zip"'}), 400
+
+    raw_filters = {key: data.get(key) for key in REPORT_FILTER_KEYS if data.get(key)}
+    try:
+        parse_record_filters(raw_filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    job = ReportJob(user_id=current_user.id, kind=kind, filters=json.dumps(raw_filters))
+    db.session.add(job)
+    db.session.commit()
+
+    try:
+        executor = get_bundle_executor() if kind == 'zip' else get_report_executor()
+        executor.submit(run_report_job, job.id)
+    except Exception as e:
+        current_app.logger.error(f"Could not queue report job {job.id}: {str(e)}")
+        job.status = 'failed'
+        job.error = 'Report worker unavailable'
+        job.finished_at = datetime.now()
+        db.session.commit()
+        return jsonify({'success': False, 'message': 'Report worker unavailable'}), 503
+
+    return jsonify({'success': True, 'job': report_job_to_dict(job)}), 202
+
+@bp.route('/reports/<job_id>')
+@login_required
+def report_status(job_id):
+    job = get_own_report_job(job_id)
+    return jsonify({'success': True, 'job': report_job_to_dict(job)})
+
+@bp.route('/reports/<job_id>/download')
+@login_required
+def download_report(job_id):
+    job = get_own_report_job(job_id)
+    if job.status != 'done' or not job.file_path or not os.path.exists(job.file_path):
+        return jsonify({'success': False, 'message': f'Report is {job.status}'}), 409
+
+    filename = f"attendance_records_{job.created_at.strftime('%Y%m%d_%H%M%S')}.{job.kind}"
+    return send_file(job.file_path, as_attachment=True, download_name=filename,
+                     mimetype=REPORT_MIMETYPES[job.kind])
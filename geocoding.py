@@ -0,0 +1,183 @@
+"""Reverse geocoding providers and coordinate grid cells.
+
+Coordinates are snapped to square grid cells (``cell_key``) so everyone in
+the same hall shares one lookup; the app caches a name per cell. Providers
+turn a point into a place name and are tried in order by ChainProvider:
+
+* ``GazetteerProvider`` - local list of named places (JSON), each a
+  circle or polygon, e.g. campus buildings. Instant and offline.
+* ``NominatimProvider`` - OpenStreetMap's reverse geocoder over HTTP,
+  throttled to one request per ``min_interval`` seconds per process.
+
+Custom providers are any object with ``name``, ``local`` and
+``reverse(lat, lng) -> str or None``; ``build_provider`` loads them from a
+``"module:factory"`` spec, calling ``factory(config)``.
+
+Gazetteer files list places in priority order (first match wins)::
+
+    [{"name": "Faculty of Environmental Sciences", "lat": 8.85, "lng": 7.87, "radius_m": 60},
+     {"name": "Lecture Theatre 1", "polygon": [[8.851, 7.871], [8.851, 7.872], [8.852, 7.872]]}]
+"""
+import importlib
+import json
+import logging
+import math
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+from geofence import Geofence
+
+logger = logging.getLogger(__name__)
+
+METRES_PER_DEGREE = 111320.0
+
+
+class GeocoderError(Exception):
+    pass
+
+
+def cell_key(lat, lng, cell_m):
+    # Rows are cell_m tall; columns are cell_m wide at the row's latitude
+    row = math.floor(lat * METRES_PER_DEGREE / cell_m)
+    row_lat = (row + 0.5) * cell_m / METRES_PER_DEGREE
+    lng_step = cell_m / (METRES_PER_DEGREE * max(math.cos(math.radians(row_lat)), 1e-6))
+    col = math.floor(lng / lng_step)
+    return f'{int(cell_m)}:{row}:{col}'
+
+
+def cell_center(key):
+    cell_m, row, col = (int(part) for part in key.split(':'))
+    lat = (row + 0.5) * cell_m / METRES_PER_DEGREE
+    lng_step = cell_m / (METRES_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat, (col + 0.5) * lng_step
+
+
+class GazetteerProvider:
+    name = 'gazetteer'
+    local = True
+
+    def __init__(self, places):
+        # places: [(name, Geofence)]
+        self.places = places
+
+    @classmethod
+    def from_file(cls, path):
+        # Raises ValueError for a file that isn't a list of places
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)
+            places = []
+            for entry in entries:
+                fence = Geofence(entry.get('lat'), entry.get('lng'), entry.get('radius_m'),
+                                 polygon=entry.get('polygon'))
+                places.append((entry['name'], fence))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f'Invalid gazetteer {path}: {e!r}') from None
+        return cls(places)
+
+    def reverse(self, lat, lng):
+        # First place containing the point, so list rooms before buildings
+        for name, fence in self.places:
+            if fence.distances_m([lat], [lng])[0] == 0:
+                return name
+        return None
+
+
+class NominatimProvider:
+    name = 'nominatim'
+    local = False
+
+    def __init__(self, url, user_agent, timeout=3.0, min_interval=1.0):
+        self.url = url
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_request = 0.0
+
+    def reverse(self, lat, lng):
+        query = urllib.parse.urlencode({'format': 'json', 'lat': f'{lat:.6f}', 'lon': f'{lng:.6f}',
+                                        'zoom': 18, 'addressdetails': 1})
+        request = urllib.request.Request(f'{self.url}?{query}', headers={'User-Agent': self.user_agent})
+        with self._lock:
+            # Nominatim's usage policy allows one request per second
+            wait = self._last_request + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request = time.monotonic()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = json.load(response)
+        except (OSError, ValueError) as e:
+            raise GeocoderError(f'Nominatim lookup failed: {e}')
+        address = data.get('address') or {}
+        parts = [address.get(key) for key in ('road', 'neighbourhood', 'suburb', 'city', 'state', 'country')]
+        return ', '.join(part for part in parts if part) or data.get('display_name') or None
+
+
+class ChainProvider:
+    name = 'chain'
+
+    def __init__(self, providers):
+        self.providers = providers
+        self.local = all(provider.local for provider in providers)
+
+    def reverse(self, lat, lng, local_only=False):
+        # Returns (name, provider name); errors move on to the next provider
+        for provider in self.providers:
+            if local_only and not provider.local:
+                continue
+            try:
+                name = provider.reverse(lat, lng)
+            except GeocoderError as e:
+                logger.warning(str(e))
+                continue
+            if name:
+                return name, provider.name
+        return None, None
+
+
+def build_provider(spec, config):
+    # spec: 'gazetteer', 'nominatim' or 'module:factory'
+    if spec == 'gazetteer':
+        return GazetteerProvider.from_file(config['GEOCODER_GAZETTEER'])
+    if spec == 'nominatim':
+        return NominatimProvider(config['GEOCODER_NOMINATIM_URL'], config['GEOCODER_USER_AGENT'],
+                                 timeout=config['GEOCODER_TIMEOUT'])
+    module_name, _, factory = spec.partition(':')
+    if not factory:
+        raise ValueError(f'Unknown geocoder provider {spec!r}')
+    return getattr(importlib.import_module(module_name), factory)(config)
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> (event, result holder)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = (threading.Event(), {})
+        event, holder = call
+        if not leader:
+            event.wait()
+            if 'error' in holder:
+                raise holder['error']
+            return holder['value']
+        try:
+            holder['value'] = fn()
+            return holder['value']
+        except Exception as e:
+            holder['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            event.set()
@@ -0,0 +1,125 @@
+"""Geofence checks for submitted check-in locations.
+
+A Geofence is either a circle (centre and radius in metres) or a polygon of
+(latitude, longitude) vertices, e.g. a lecture hall's outline.
+``score_locations`` checks whole arrays of fixes at once with NumPy, so a
+course's entire history can be re-scored in one pass; ``score_location``
+is the single-fix wrapper used at submit time, so both paths share one rule.
+
+A fix is accuracy-weighted: it passes if its error circle (``accuracy``
+metres) reaches within ``slack_m`` of the fence. Fixes whose accuracy is
+worse than ``max_accuracy_m`` cannot tell inside from outside and are
+flagged separately.
+
+NumPy is imported on first use, so importing this module for
+LOCATION_FLAGS doesn't load it at app startup.
+"""
+EARTH_RADIUS_M = 6371008.8
+
+# Stored in StudentRecord.location_flag; the array codes index this tuple
+LOCATION_FLAGS = ('ok', 'outside', 'low_accuracy', 'no_location')
+FLAG_OK, FLAG_OUTSIDE, FLAG_LOW_ACCURACY, FLAG_NO_LOCATION = range(len(LOCATION_FLAGS))
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    # Great-circle distance in metres; works on scalars or arrays
+    import numpy as np
+
+    lat1, lng1, lat2, lng2 = (np.radians(value) for value in (lat1, lng1, lat2, lng2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class Geofence:
+    def __init__(self, lat=None, lng=None, radius_m=None, polygon=None):
+        if polygon:
+            import numpy as np
+
+            if len(polygon) < 3:
+                raise ValueError('A geofence polygon needs at least 3 points')
+            self.polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+        elif None not in (lat, lng, radius_m):
+            if radius_m <= 0:
+                raise ValueError('Geofence radius must be positive')
+            self.polygon = None
+        else:
+            raise ValueError('A geofence needs a centre and radius, or a polygon')
+        self.lat, self.lng, self.radius_m = lat, lng, radius_m
+
+    def _project(self, lats, lngs):
+        # Local flat projection in metres around the polygon's first vertex;
+        # accurate to well under a metre at lecture-hall scale
+        import numpy as np
+
+        lat0, lng0 = self.polygon[0]
+        scale = np.radians(1.0) * EARTH_RADIUS_M
+        return (lngs - lng0) * scale * np.cos(np.radians(lat0)), (lats - lat0) * scale
+
+    def distances_m(self, lats, lngs):
+        # Metres from each point to the fence; 0 for points inside it
+        import numpy as np
+
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        if self.polygon is None:
+            return np.maximum(haversine_m(lats, lngs, self.lat, self.lng) - self.radius_m, 0.0)
+
+        px, py = self._project(lats, lngs)
+        vx, vy = self._project(self.polygon[:, 0], self.polygon[:, 1])
+        inside = np.zeros(px.shape, dtype=bool)
+        nearest = np.full(px.shape, np.inf)
+        # Loop over edges (a handful), vectorised over points (many)
+        for i in range(len(vx)):
+            x1, y1 = vx[i - 1], vy[i - 1]
+            x2, y2 = vx[i], vy[i]
+            # Ray casting; horizontal edges never cross, so their NaNs are masked
+            crosses = (y1 > py) != (y2 > py)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= crosses & (px < x_cross)
+            dx, dy = x2 - x1, y2 - y1
+            length_sq = dx * dx + dy * dy
+            t = np.clip(((px - x1) * dx + (py - y1) * dy) / length_sq, 0.0, 1.0) if length_sq else 0.0
+            nearest = np.minimum(nearest, np.hypot(px - (x1 + t * dx), py - (y1 + t * dy)))
+        return np.where(inside, 0.0, nearest)
+
+
+def score_locations(fence, lats, lngs, accuracies, slack_m=25.0, max_accuracy_m=500.0):
+    """Return (flag codes, metres outside the fence) for arrays of fixes.
+
+    Missing coordinates should be passed as NaN; a missing accuracy counts
+    as a perfect fix. Distances are NaN where there was no location.
+    """
+    import numpy as np
+
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    accuracies = np.nan_to_num(np.asarray(accuracies, dtype=float), nan=0.0)
+
+    missing = np.isnan(lats) | np.isnan(lngs)
+    distances = np.full(lats.shape, np.nan)
+    if (~missing).any():
+        distances[~missing] = fence.distances_m(lats[~missing], lngs[~missing])
+
+    flags = np.full(lats.shape, FLAG_OK, dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        flags[distances - accuracies > slack_m] = FLAG_OUTSIDE
+    flags[accuracies > max_accuracy_m] = FLAG_LOW_ACCURACY
+    flags[missing] = FLAG_NO_LOCATION
+    return flags, distances
+
+
+def score_location(fence, lat, lng, accuracy, **limits):
+    # Single fix -> (flag name, metres outside or None)
+    import numpy as np
+
+    flags, distances = score_locations(
+        fence,
+        [np.nan if lat is None else lat],
+        [np.nan if lng is None else lng],
+        [np.nan if accuracy is None else accuracy],
+        **limits
+    )
+    distance = None if np.isnan(distances[0]) else round(float(distances[0]), 1)
+    return LOCATION_FLAGS[flags[0]], distance
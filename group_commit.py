@@ -0,0 +1,66 @@
+"""Group commit: coalesce many small writes into a few transactions.
+
+Callers hand items to a GroupCommitWriter and wait on the returned Future.
+A background thread drains the queue into batches of up to ``max_batch``
+items (or whatever arrived within ``max_delay`` seconds of the first one)
+and passes each batch to ``flush``, which must persist it in one transaction
+and return one result per item, in order. Futures resolve only after
+``flush`` returns, i.e. once the batch is durable. A caller that gives up
+waiting can ``cancel()`` its Future: that succeeds, and the item is never
+written, only while the item is still queued.
+
+Batching only happens when several requests are in flight in the same
+process, so it pays off with threaded or async workers, not sync ones.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    def __init__(self, flush, max_batch=100, max_delay=0.05, name='group-commit'):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Drop cancelled items; the rest can no longer be cancelled
+            batch = [(item, future) for item, future in self._next_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.flush([item for item, _ in batch])
+            except Exception as e:
+                logger.exception('Group commit flush of %d items failed', len(batch))
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,48 @@
+"""Gunicorn settings: threaded workers sized from the CPU count.
+
+Submissions are short and spend most of their time waiting on the database.
+Exports, bulk uploads and slow clients on campus Wi-Fi can hold a request
+for much longer. With sync workers a handful of those occupy every worker
+and the submission burst queues behind them. gthread workers serve
+GUNICORN_THREADS requests each, so submissions keep getting threads while
+exports run.
+
+Per-request limits come from the app's REQUEST_TIMEOUT_* budgets (see
+request_timeouts.py). For gthread workers, gunicorn's own timeout only
+catches a worker whose main loop has stopped responding.
+
+Every setting can be overridden from the environment or on the command line:
+
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 8080)}")
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Threads carry the concurrency, so one process per core (plus one to cover
+# a worker that is restarting) is enough. More processes add SQLite writers
+# and per-process caches, not throughput.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# Connections beyond this wait in the accept backlog instead of being read
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Phones reuse the connection for the check-in page's follow-up requests
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks can't build up; the jitter
+# keeps them from all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# The worker heartbeat file lives in memory when /dev/shm exists (Docker)
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None  # empty disables it
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
@@ -0,0 +1,190 @@
+"""Opt-in request and SQL instrumentation.
+
+``init_instrumentation(app, engine)`` records, per request, the wall time,
+the number of SQL statements and the time spent in them (via
+before/after_cursor_execute events on the app's engine, so several apps in
+one process don't count each other's queries), and flags likely N+1
+patterns: the same statement run ``N_PLUS_ONE_THRESHOLD`` or more times in
+one request. Aggregates are served in Prometheus text format from
+``/metrics``: with a bearer ``METRICS_TOKEN`` if one is set, else only to
+clients on this machine. A ``PROFILE_SAMPLE_RATE`` fraction of requests can
+be run under cProfile with the stats dumped to ``PROFILE_DIR``.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RequestState:
+    def __init__(self, endpoint, method):
+        self.endpoint = endpoint
+        self.method = method
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = Counter()
+        self.profiler = None
+        self.status = None
+        self.streamed = False
+        self.finished = False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()  # (endpoint, method, status) -> count
+        self.duration_buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.duration_sum = Counter()
+        self.duration_count = Counter()
+        self.queries = Counter()
+        self.sql_seconds = Counter()
+        self.n_plus_one = Counter()
+
+    def observe(self, state, status, elapsed, n_plus_one):
+        with self._lock:
+            self.requests[(state.endpoint, state.method, status)] += 1
+            buckets = self.duration_buckets[state.endpoint]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if elapsed <= bound:
+                    buckets[i] += 1
+            self.duration_sum[state.endpoint] += elapsed
+            self.duration_count[state.endpoint] += 1
+            self.queries[state.endpoint] += state.queries
+            self.sql_seconds[state.endpoint] += state.sql_seconds
+            if n_plus_one:
+                self.n_plus_one[state.endpoint] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines += ['# HELP http_requests_total Requests handled, by endpoint, method and status.',
+                      '# TYPE http_requests_total counter']
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",'
+                             f'status="{status}"}} {count}')
+
+            lines += ['# HELP http_request_duration_seconds Request wall time, including streamed bodies.',
+                      '# TYPE http_request_duration_seconds histogram']
+            for endpoint in sorted(self.duration_count):
+                for bound, count in zip(DURATION_BUCKETS, self.duration_buckets[endpoint]):
+                    lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",'
+                                 f'le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} '
+                             f'{self.duration_count[endpoint]}')
+                lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} '
+                             f'{self.duration_sum[endpoint]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} '
+                             f'{self.duration_count[endpoint]}')
+
+            for name, help_text, values, fmt in (
+                ('db_queries_total', 'SQL statements executed while serving requests.',
+                 self.queries, '{}'),
+                ('db_query_duration_seconds_total', 'Time spent in SQL statements.',
+                 self.sql_seconds, '{:.6f}'),
+                ('n_plus_one_requests_total', 'Requests that repeated one statement past the threshold.',
+                 self.n_plus_one, '{}'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {fmt.format(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def init_instrumentation(app, engine):
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', 10)
+    app.config.setdefault('SLOW_REQUEST_SECONDS', 2.0)
+    app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+    app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config.setdefault('METRICS_TOKEN', None)
+
+    registry = MetricsRegistry()
+    app.extensions['instrumentation'] = registry
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        # Background threads (report jobs, group commit) have no request to charge
+        if not has_request_context():
+            return
+        state = g.get('instrumentation')
+        if state is not None:
+            state.queries += 1
+            state.sql_seconds += elapsed
+            state.statements[statement] += 1
+
+    def finish(state, status):
+        if state.finished:
+            return
+        state.finished = True
+        elapsed = time.perf_counter() - state.started
+
+        repeated = [(statement, count) for statement, count in state.statements.items()
+                    if count >= app.config['N_PLUS_ONE_THRESHOLD']]
+        for statement, count in repeated:
+            app.logger.warning(f"Possible N+1 in {state.endpoint}: {count}x {' '.join(statement.split())[:200]}")
+        if elapsed >= app.config['SLOW_REQUEST_SECONDS']:
+            app.logger.warning(f"Slow request {state.method} {state.endpoint}: {elapsed:.3f}s, "
+                               f"{state.queries} queries, {state.sql_seconds:.3f}s in SQL")
+        registry.observe(state, status, elapsed, bool(repeated))
+
+        if state.profiler is not None:
+            state.profiler.disable()
+            os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+            filename = f"{state.endpoint}-{time.strftime('%Y%m%d_%H%M%S')}-{os.getpid()}-{id(state)}.prof"
+            state.profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], filename))
+
+    @app.before_request
+    def start_request_instrumentation():
+        state = RequestState(request.endpoint or 'unmatched', request.method)
+        if random.random() < app.config['PROFILE_SAMPLE_RATE']:
+            state.profiler = cProfile.Profile()
+            try:
+                state.profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this thread
+                state.profiler = None
+        g.instrumentation = state
+
+    @app.after_request
+    def note_response_status(response):
+        state = g.get('instrumentation')
+        if state is not None:
+            state.status = response.status_code
+            state.streamed = response.is_streamed
+            if response.is_streamed:
+                # Count the time spent streaming the body too
+                response.call_on_close(lambda: finish(state, response.status_code))
+        return response
+
+    @app.teardown_request
+    def finish_request_instrumentation(exc):
+        # Runs even when the view or an after_request hook raised
+        state = g.get('instrumentation')
+        if state is not None and (exc is not None or not state.streamed):
+            finish(state, 500 if exc is not None or state.status is None else state.status)
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token:
+            if request.headers.get('Authorization') != f'Bearer {token}':
+                abort(403)
+        elif request.remote_addr not in LOCAL_ADDRESSES:
+            # No token: only a scraper on this machine may read it
+            abort(403)
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
@@ -0,0 +1,36 @@
+"""Add geocode_cell table for cached reverse geocoding
+
+Revision ID: a8e2c4f7b139
+Revises: f3a9d6c1e842
+Create Date: 2026-10-16 19:11:52.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e2c4f7b139'
+down_revision = 'f3a9d6c1e842'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('geocode_cell',
+    sa.Column('cell', sa.String(length=40), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=True),
+    sa.Column('provider', sa.String(length=50), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('cell')
+    )
+    with op.batch_alter_table('geocode_cell', schema=None) as batch_op:
+        batch_op.create_index('ix_geocode_cell_last_used_at', ['last_used_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('geocode_cell', schema=None) as batch_op:
+        batch_op.drop_index('ix_geocode_cell_last_used_at')
+
+    op.drop_table('geocode_cell')
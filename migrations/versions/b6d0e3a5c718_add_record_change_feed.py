@@ -0,0 +1,35 @@
+"""Add record_change feed for the live records dashboard
+
+Revision ID: b6d0e3a5c718
+Revises: a8e2c4f7b139
+Create Date: 2026-10-16 20:05:37.182940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d0e3a5c718'
+down_revision = 'a8e2c4f7b139'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('record_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('record_id', sa.Integer(), nullable=False),
+    sa.Column('deleted', sa.Boolean(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('record_change', schema=None) as batch_op:
+        batch_op.create_index('ix_record_change_changed_at', ['changed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('record_change', schema=None) as batch_op:
+        batch_op.drop_index('ix_record_change_changed_at')
+
+    op.drop_table('record_change')
@@ -0,0 +1,78 @@
+"""Add daily course and student attendance rollups
+
+Creates course_daily_rollup and student_daily_rollup and fills them from
+the existing student_record rows.
+
+Revision ID: c9f4a7e2d306
+Revises: b6d0e3a5c718
+Create Date: 2026-10-16 21:14:26.903518
+
+"""
+from collections import defaultdict
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9f4a7e2d306'
+down_revision = 'b6d0e3a5c718'
+branch_labels = None
+depends_on = None
+
+
+def _backfill(course_table, student_table):
+    record = sa.table('student_record',
+                      sa.column('id', sa.Integer),
+                      sa.column('matric_no', sa.String),
+                      sa.column('course', sa.String),
+                      sa.column('timestamp', sa.DateTime))
+    day = sa.func.date(record.c.timestamp)
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(record.c.matric_no, record.c.course, day, sa.func.count(record.c.id))
+                        .where(record.c.timestamp.isnot(None))
+                        .group_by(record.c.matric_no, record.c.course, day)).all()
+    if not rows:
+        return
+    student_rows = []
+    course_rows = defaultdict(lambda: [0, 0])
+    for matric_no, course, row_day, submissions in rows:
+        row_day = row_day if isinstance(row_day, date) else date.fromisoformat(row_day)
+        student_rows.append({'matric_no': matric_no, 'course': course, 'day': row_day,
+                             'submissions': submissions})
+        course_rows[(course, row_day)][0] += submissions
+        course_rows[(course, row_day)][1] += 1
+    op.bulk_insert(student_table, student_rows)
+    op.bulk_insert(course_table, [{'course': course, 'day': row_day, 'submissions': submissions,
+                                   'students': students}
+                                  for (course, row_day), (submissions, students) in course_rows.items()])
+
+
+def upgrade():
+    course_table = op.create_table('course_daily_rollup',
+    sa.Column('course', sa.String(length=50), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('submissions', sa.Integer(), nullable=False),
+    sa.Column('students', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('course', 'day')
+    )
+    student_table = op.create_table('student_daily_rollup',
+    sa.Column('matric_no', sa.String(length=20), nullable=False),
+    sa.Column('course', sa.String(length=50), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('submissions', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('matric_no', 'course', 'day')
+    )
+    with op.batch_alter_table('student_daily_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_student_daily_rollup_course_day', ['course', 'day'], unique=False)
+
+    _backfill(course_table, student_table)
+
+
+def downgrade():
+    with op.batch_alter_table('student_daily_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_daily_rollup_course_day')
+
+    op.drop_table('student_daily_rollup')
+    op.drop_table('course_daily_rollup')
@@ -0,0 +1,90 @@
+"""One submission per student, course and session window
+
+Adds session_window (the row's timestamp floored to SESSION_WINDOW_MINUTES)
+to student_record and attendance, backfills it, and replaces the old
+"one record per matric number, ever" constraint on student_record with a
+unique (session_window, course, matric_no) index on both tables. Repeat
+attendance rows in the same window are removed, keeping the earliest.
+
+Revision ID: d2a7f3b8e615
+Revises: c4e92d5a7b13
+Create Date: 2026-10-16 15:47:19.220841
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7f3b8e615'
+down_revision = 'c4e92d5a7b13'
+branch_labels = None
+depends_on = None
+
+
+def _window_start(timestamp, minutes):
+    midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + timedelta(minutes=((timestamp - midnight) // timedelta(minutes=minutes)) * minutes)
+
+
+def _backfill(table_name):
+    minutes = current_app.config.get('SESSION_WINDOW_MINUTES', 60)
+    table = sa.table(table_name,
+                     sa.column('id', sa.Integer),
+                     sa.column('timestamp', sa.DateTime),
+                     sa.column('session_window', sa.DateTime))
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(table.c.id, table.c.timestamp)
+                        .where(table.c.timestamp.isnot(None))).all()
+    if rows:
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id'))
+            .values(session_window=sa.bindparam('window')),
+            [{'row_id': row_id, 'window': _window_start(timestamp, minutes)} for row_id, timestamp in rows]
+        )
+
+
+def _old_matric_constraint():
+    # SQLite leaves it unnamed; batch mode names it via the naming convention
+    if op.get_bind().dialect.name == 'sqlite':
+        return 'uq_student_record_matric_no'
+    return 'student_record_matric_no_key'
+
+
+def upgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('session_window', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('student_record', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('session_window', sa.DateTime(), nullable=True))
+
+    _backfill('attendance')
+    _backfill('student_record')
+
+    op.execute(
+        "DELETE FROM attendance WHERE session_window IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM attendance WHERE session_window IS NOT NULL "
+        "GROUP BY session_window, course, matric_no)"
+    )
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.create_index('ix_attendance_submission', ['session_window', 'course', 'matric_no'], unique=True)
+
+    with op.batch_alter_table('student_record', schema=None,
+                              naming_convention={'uq': 'uq_%(table_name)s_%(column_0_name)s'}) as batch_op:
+        batch_op.drop_constraint(_old_matric_constraint(), type_='unique')
+        batch_op.create_index('ix_student_record_submission', ['session_window', 'course', 'matric_no'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('student_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_record_submission')
+        batch_op.create_unique_constraint(_old_matric_constraint(), ['matric_no'])
+        batch_op.drop_column('session_window')
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.drop_index('ix_attendance_submission')
+        batch_op.drop_column('session_window')
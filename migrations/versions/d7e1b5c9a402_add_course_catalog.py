@@ -0,0 +1,198 @@
+"""Add course catalog and course_id on attendance tables
+
+Creates the course table and course_id foreign keys on student_record,
+attendance and student, then backfills them: every course string is
+canonicalised ('csc301' -> 'CSC 301'), one course row is created per
+canonical code, and rows are rewritten to the canonical code and its id.
+
+Spellings that collapse together can make two submissions by one student
+in one session window collide on the unique submission index; the later
+one is deleted, as the index would have rejected it. Attendance counters
+and daily rollups are re-keyed to the canonical codes. The downgrade drops
+the catalog but leaves the canonical course strings in place.
+
+Revision ID: d7e1b5c9a402
+Revises: c9f4a7e2d306
+Create Date: 2026-10-17 00:02:51.417093
+
+"""
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e1b5c9a402'
+down_revision = 'c9f4a7e2d306'
+branch_labels = None
+depends_on = None
+
+CODE_RE = re.compile(r'^([A-Z]+)\s*[-/.]?\s*(\d+[A-Z]?)$')
+
+
+def _canonical(raw):
+    # courses.canonical_course_code as of this revision
+    text = ' '.join(str(raw or '').upper().split())
+    match = CODE_RE.match(text)
+    if match:
+        return f'{match.group(1)} {match.group(2)}'
+    return text
+
+
+def _table(name, *columns):
+    return sa.table(name, *(sa.column(column) if isinstance(column, str) else column
+                            for column in columns))
+
+
+def _backfill():
+    bind = op.get_bind()
+    course = _table('course', 'id', 'code', 'created_at')
+    record = _table('student_record', 'id', 'course', 'course_id', 'session_window', 'matric_no',
+                    sa.column('timestamp', sa.DateTime), 'active')
+    attendance = _table('attendance', 'id', 'course', 'course_id', 'session_window', 'matric_no')
+    student = _table('student', 'id', 'course', 'course_id')
+    lecture_session = _table('lecture_session', 'id', 'course')
+    counter = _table('attendance_counter', 'course', 'active', 'total')
+    course_rollup = _table('course_daily_rollup', 'course', 'day', 'submissions', 'students')
+    student_rollup = _table('student_daily_rollup', 'matric_no', 'course', sa.column('day', sa.Date),
+                            'submissions')
+
+    raw_courses = set()
+    for table in (record, attendance, student, lecture_session):
+        raw_courses.update(bind.execute(sa.select(table.c.course).distinct()).scalars())
+    codes = {raw: _canonical(raw) for raw in raw_courses if _canonical(raw)}
+    if not codes:
+        return
+
+    now = datetime.now()
+    op.bulk_insert(sa.table('course', sa.column('code', sa.String), sa.column('created_at', sa.DateTime)),
+                   [{'code': code, 'created_at': now} for code in sorted(set(codes.values()))])
+    ids = dict(bind.execute(sa.select(course.c.code, course.c.id)).all())
+
+    renamed = {raw for raw, code in codes.items() if raw != code}
+    spellings = defaultdict(set)
+    for raw, code in codes.items():
+        spellings[code].add(raw)
+    merged = {raw for raw_set in spellings.values() if len(raw_set) > 1 for raw in raw_set}
+
+    rollup_deltas = Counter()
+    for table in (record, attendance):
+        if not merged:
+            break
+        # Keep the first submission per canonical (window, course, student)
+        columns = [table.c.id, table.c.session_window, table.c.course, table.c.matric_no]
+        if table is record:
+            columns.append(table.c.timestamp)
+        rows = bind.execute(sa.select(*columns).where(table.c.course.in_(merged))
+                            .order_by(table.c.id)).all()
+        seen = set()
+        duplicates = []
+        for row in rows:
+            if row.session_window is None:
+                continue
+            key = (row.session_window, codes[row.course], row.matric_no)
+            if key in seen:
+                duplicates.append(row.id)
+                if table is record and row.timestamp is not None:
+                    rollup_deltas[(row.matric_no, codes[row.course], row.timestamp.date())] -= 1
+            seen.add(key)
+        for start in range(0, len(duplicates), 500):
+            bind.execute(table.delete().where(table.c.id.in_(duplicates[start:start + 500])))
+
+    for table in (record, attendance, student):
+        for raw, code in codes.items():
+            bind.execute(table.update().where(table.c.course == raw)
+                         .values(course=code, course_id=ids[code]))
+    for raw in renamed:
+        bind.execute(lecture_session.update().where(lecture_session.c.course == raw)
+                     .values(course=codes[raw]))
+
+    if not renamed:
+        return
+
+    # Counters and rollups are keyed by course string
+    totals = bind.execute(sa.select(record.c.course, record.c.active, sa.func.count(record.c.id))
+                          .where(record.c.active.isnot(None))
+                          .group_by(record.c.course, record.c.active)).all()
+    bind.execute(counter.delete())
+    if totals:
+        op.bulk_insert(sa.table('attendance_counter', sa.column('course', sa.String),
+                                sa.column('active', sa.Boolean), sa.column('total', sa.Integer)),
+                       [{'course': course_code, 'active': active, 'total': total}
+                        for course_code, active, total in totals])
+
+    # Rollups also cover archived semesters, so they are re-keyed rather than rebuilt
+    submissions = Counter(rollup_deltas)
+    for matric_no, course_code, day, count in bind.execute(sa.select(
+            student_rollup.c.matric_no, student_rollup.c.course, student_rollup.c.day,
+            student_rollup.c.submissions)):
+        submissions[(matric_no, _canonical(course_code) or course_code, day)] += count
+    bind.execute(student_rollup.delete())
+    bind.execute(course_rollup.delete())
+    student_rows = []
+    course_rows = defaultdict(lambda: [0, 0])
+    for (matric_no, course_code, day), count in submissions.items():
+        if count > 0:
+            student_rows.append({'matric_no': matric_no, 'course': course_code, 'day': day,
+                                 'submissions': count})
+            course_rows[(course_code, day)][0] += count
+            course_rows[(course_code, day)][1] += 1
+    if student_rows:
+        op.bulk_insert(sa.table('student_daily_rollup', sa.column('matric_no', sa.String),
+                                sa.column('course', sa.String), sa.column('day', sa.Date),
+                                sa.column('submissions', sa.Integer)), student_rows)
+        op.bulk_insert(sa.table('course_daily_rollup', sa.column('course', sa.String),
+                                sa.column('day', sa.Date), sa.column('submissions', sa.Integer),
+                                sa.column('students', sa.Integer)),
+                       [{'course': course_code, 'day': day, 'submissions': count, 'students': students}
+                        for (course_code, day), (count, students) in course_rows.items()])
+
+
+def upgrade():
+    op.create_table('course',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('code', sa.String(length=50), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('code')
+    )
+
+    with op.batch_alter_table('student_record', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('course_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_student_record_course_id_course', 'course', ['course_id'], ['id'])
+        batch_op.create_index('ix_student_record_course_id_timestamp', ['course_id', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('course_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_attendance_course_id_course', 'course', ['course_id'], ['id'])
+        batch_op.create_index('ix_attendance_course_id_timestamp', ['course_id', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('course_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_student_course_id_course', 'course', ['course_id'], ['id'])
+        batch_op.create_index('ix_student_course_id', ['course_id'], unique=False)
+
+    _backfill()
+
+
+def downgrade():
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_course_id')
+        batch_op.drop_constraint('fk_student_course_id_course', type_='foreignkey')
+        batch_op.drop_column('course_id')
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.drop_index('ix_attendance_course_id_timestamp')
+        batch_op.drop_constraint('fk_attendance_course_id_course', type_='foreignkey')
+        batch_op.drop_column('course_id')
+
+    with op.batch_alter_table('student_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_record_course_id_timestamp')
+        batch_op.drop_constraint('fk_student_record_course_id_course', type_='foreignkey')
+        batch_op.drop_column('course_id')
+
+    op.drop_table('course')
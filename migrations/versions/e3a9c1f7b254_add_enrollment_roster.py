@@ -0,0 +1,39 @@
+"""Add enrollment table for course rosters
+
+Revision ID: e3a9c1f7b254
+Revises: d7e1b5c9a402
+Create Date: 2026-10-17 01:12:08.530214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a9c1f7b254'
+down_revision = 'd7e1b5c9a402'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('enrollment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['student_id'], ['student.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('enrollment', schema=None) as batch_op:
+        batch_op.create_index('ix_enrollment_course_student', ['course_id', 'student_id'], unique=True)
+        batch_op.create_index('ix_enrollment_student_id', ['student_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('enrollment', schema=None) as batch_op:
+        batch_op.drop_index('ix_enrollment_student_id')
+        batch_op.drop_index('ix_enrollment_course_student')
+
+    op.drop_table('enrollment')
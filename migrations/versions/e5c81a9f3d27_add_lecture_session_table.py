@@ -0,0 +1,68 @@
+"""Add lecture_session table and session_id on submissions
+
+Revision ID: e5c81a9f3d27
+Revises: d2a7f3b8e615
+Create Date: 2026-10-16 17:02:44.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c81a9f3d27'
+down_revision = 'd2a7f3b8e615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('lecture_session',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course', sa.String(length=50), nullable=False),
+    sa.Column('lecturer_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=True),
+    sa.Column('opens_at', sa.DateTime(), nullable=False),
+    sa.Column('closes_at', sa.DateTime(), nullable=False),
+    sa.Column('geofence_lat', sa.Float(), nullable=True),
+    sa.Column('geofence_lng', sa.Float(), nullable=True),
+    sa.Column('geofence_radius_m', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['lecturer_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('lecture_session', schema=None) as batch_op:
+        batch_op.create_index('ix_lecture_session_closes_at', ['closes_at'], unique=False)
+        batch_op.create_index('ix_lecture_session_course_opens_at', ['course', 'opens_at'], unique=False)
+        batch_op.create_index('ix_lecture_session_lecturer_opens_at', ['lecturer_id', 'opens_at'], unique=False)
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('session_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_attendance_session_id_lecture_session',
+                                    'lecture_session', ['session_id'], ['id'])
+        batch_op.create_index('ix_attendance_session_timestamp', ['session_id', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('student_record', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('session_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_student_record_session_id_lecture_session',
+                                    'lecture_session', ['session_id'], ['id'])
+        batch_op.create_index('ix_student_record_session_timestamp', ['session_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('student_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_record_session_timestamp')
+        batch_op.drop_constraint('fk_student_record_session_id_lecture_session', type_='foreignkey')
+        batch_op.drop_column('session_id')
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.drop_index('ix_attendance_session_timestamp')
+        batch_op.drop_constraint('fk_attendance_session_id_lecture_session', type_='foreignkey')
+        batch_op.drop_column('session_id')
+
+    with op.batch_alter_table('lecture_session', schema=None) as batch_op:
+        batch_op.drop_index('ix_lecture_session_lecturer_opens_at')
+        batch_op.drop_index('ix_lecture_session_course_opens_at')
+        batch_op.drop_index('ix_lecture_session_closes_at')
+
+    op.drop_table('lecture_session')
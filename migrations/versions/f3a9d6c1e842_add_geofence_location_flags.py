@@ -0,0 +1,36 @@
+"""Add geofence polygon to lecture_session and location flags to student_record
+
+Revision ID: f3a9d6c1e842
+Revises: e5c81a9f3d27
+Create Date: 2026-10-16 18:24:09.731552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9d6c1e842'
+down_revision = 'e5c81a9f3d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('lecture_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geofence_polygon', sa.Text(), nullable=True))
+
+    with op.batch_alter_table('student_record', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('location_flag', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('location_distance_m', sa.Float(), nullable=True))
+        batch_op.create_index('ix_student_record_location_flag_timestamp', ['location_flag', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('student_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_record_location_flag_timestamp')
+        batch_op.drop_column('location_distance_m')
+        batch_op.drop_column('location_flag')
+
+    with op.batch_alter_table('lecture_session', schema=None) as batch_op:
+        batch_op.drop_column('geofence_polygon')
@@ -0,0 +1,471 @@
+"""Database models, and the counters, rollups and change feed kept in step with them."""
+import json
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import DateTime, and_, event, inspect, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from courses import CourseCatalog, canonical_course_code
+from dedup import session_window_start
+from extensions import db
+from geofence import Geofence
+
+# User Model
+class User(UserMixin, db.Model):
+    __tablename__ = 'user'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password = db.Column(db.String(120), nullable=False)
+    role = db.Column(db.String(20), nullable=False)
+    active = db.Column(db.Boolean, default=True)  # THIS MUST EXIST
+
+    @property
+    def is_active(self):
+        return self.active
+
+# Course Model (the catalog; course strings on other tables hold its canonical code)
+class Course(db.Model):
+    __tablename__ = 'course'
+
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(50), nullable=False, unique=True)  # courses.canonical_course_code()
+    title = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<Course {self.code}>"
+
+
+class Student(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100))
+    matric_no = db.Column(db.String(50), unique=True)
+    course = db.Column(db.String(100))
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), index=True)
+    active = db.Column(db.Boolean, default=True)  # New field
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Student {self.matric_no}>'
+
+
+# Enrollment Model (the course roster, imported from CSV)
+class Enrollment(db.Model):
+    __tablename__ = 'enrollment'
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_enrollment_course_student', 'course_id', 'student_id', unique=True),
+        db.Index('ix_enrollment_student_id', 'student_id'),
+    )
+
+    def __repr__(self):
+        return f"<Enrollment {self.student_id} in {self.course_id}>"
+
+def default_session_window(now):
+    # Column default derived from the row's own timestamp, so ORM adds and
+    # Core multi-row inserts both get it without callers computing it
+    def default(context):
+        timestamp = context.get_current_parameters().get('timestamp') or now()
+        return session_window_start(timestamp, current_app.config['SESSION_WINDOW_MINUTES'])
+    return default
+
+
+# Lecture Session Model (one class meeting that students check in to)
+class LectureSession(db.Model):
+    __tablename__ = 'lecture_session'
+
+    id = db.Column(db.Integer, primary_key=True)
+    course = db.Column(db.String(50), nullable=False)
+    lecturer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    title = db.Column(db.String(200))
+    opens_at = db.Column(db.DateTime, nullable=False)
+    closes_at = db.Column(db.DateTime, nullable=False)
+    # Optional geofence: check-ins should come from within radius_m of this
+    # point, or from inside geofence_polygon (JSON [[lat, lng], ...]) if set
+    geofence_lat = db.Column(db.Float)
+    geofence_lng = db.Column(db.Float)
+    geofence_radius_m = db.Column(db.Float)
+    geofence_polygon = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_lecture_session_course_opens_at', 'course', 'opens_at'),
+        db.Index('ix_lecture_session_closes_at', 'closes_at'),
+        db.Index('ix_lecture_session_lecturer_opens_at', 'lecturer_id', 'opens_at'),
+    )
+
+    def is_open(self, at=None):
+        at = at or datetime.now()
+        return self.opens_at <= at <= self.closes_at
+
+    def get_geofence(self):
+        if self.geofence_polygon:
+            return Geofence(polygon=json.loads(self.geofence_polygon))
+        if self.geofence_radius_m:
+            return Geofence(self.geofence_lat, self.geofence_lng, self.geofence_radius_m)
+        return None
+
+    def __repr__(self):
+        return f"<LectureSession {self.id} {self.course}>"
+
+
+class StudentRecord(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    matric_no = db.Column(db.String(20), nullable=False)
+    course = db.Column(db.String(50), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'))
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    session_window = db.Column(db.DateTime, default=default_session_window(datetime.now))
+    session_id = db.Column(db.Integer, db.ForeignKey('lecture_session.id'))
+    active = db.Column(db.Boolean, default=True)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    accuracy = db.Column(db.Float)
+    location_name = db.Column(db.String(200))
+    # Geofence result: one of geofence.LOCATION_FLAGS, or NULL if never checked
+    location_flag = db.Column(db.String(20))
+    location_distance_m = db.Column(db.Float)
+
+    __table_args__ = (
+        # One submission per student, course and session window
+        db.Index('ix_student_record_submission', 'session_window', 'course', 'matric_no', unique=True),
+        db.Index('ix_student_record_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_student_record_course_timestamp', 'course', 'timestamp'),
+        db.Index('ix_student_record_active_timestamp', 'active', 'timestamp'),
+        db.Index('ix_student_record_session_timestamp', 'session_id', 'timestamp'),
+        db.Index('ix_student_record_location_flag_timestamp', 'location_flag', 'timestamp'),
+        db.Index('ix_student_record_course_id_timestamp', 'course_id', 'timestamp'),
+    )
+
+    def __repr__(self):
+        return f'<StudentRecord {self.matric_no}>'
+    
+# Attendance Model
+class Attendance(db.Model):
+    __tablename__ = 'attendance'  # Explicit table name
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    matric_no = db.Column(db.String(50), nullable=False)
+    course = db.Column(db.String(100), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'))
+    timestamp = db.Column(DateTime, default=datetime.utcnow)
+    session_window = db.Column(db.DateTime, default=default_session_window(datetime.utcnow))
+    session_id = db.Column(db.Integer, db.ForeignKey('lecture_session.id'))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    accuracy = db.Column(db.Float)
+    location_name = db.Column(db.String(200))
+
+    __table_args__ = (
+        db.Index('ix_attendance_submission', 'session_window', 'course', 'matric_no', unique=True),
+        db.Index('ix_attendance_matric_no_course', 'matric_no', 'course'),
+        db.Index('ix_attendance_course_timestamp', 'course', 'timestamp'),
+        db.Index('ix_attendance_session_timestamp', 'session_id', 'timestamp'),
+        db.Index('ix_attendance_course_id_timestamp', 'course_id', 'timestamp'),
+    )
+
+    def __repr__(self):
+        return f"<Attendance {self.matric_no}>"
+
+# Report Job Model (queued PDF/CSV exports rendered off the request thread)
+class ReportJob(db.Model):
+    __tablename__ = 'report_job'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # 'pdf', 'csv' or 'zip'
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    filters = db.Column(db.Text)  # JSON of the raw filter query args
+    file_path = db.Column(db.String(500))
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<ReportJob {self.id} {self.status}>"
+
+# Geocode Cell Model (reverse-geocoded place name per coordinate grid cell)
+class GeocodeCell(db.Model):
+    __tablename__ = 'geocode_cell'
+
+    cell = db.Column(db.String(40), primary_key=True)  # geocoding.cell_key()
+    name = db.Column(db.String(200))  # NULL: no provider knew this cell
+    provider = db.Column(db.String(50))
+    expires_at = db.Column(db.DateTime, nullable=False)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_geocode_cell_last_used_at', 'last_used_at'),
+    )
+
+    def __repr__(self):
+        return f"<GeocodeCell {self.cell}>"
+
+# Attendance Counter Model (active/inactive StudentRecord totals per course)
+class AttendanceCounter(db.Model):
+    __tablename__ = 'attendance_counter'
+
+    course = db.Column(db.String(50), primary_key=True)
+    active = db.Column(db.Boolean, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<AttendanceCounter {self.course} {self.active}={self.total}>"
+
+
+# Daily Rollup Models (per course and per student, kept in step with
+# student_record so analytics never scan it)
+class CourseDailyRollup(db.Model):
+    __tablename__ = 'course_daily_rollup'
+
+    course = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    submissions = db.Column(db.Integer, nullable=False, default=0)
+    students = db.Column(db.Integer, nullable=False, default=0)  # distinct matric numbers
+
+    def __repr__(self):
+        return f"<CourseDailyRollup {self.course} {self.day}>"
+
+
+class StudentDailyRollup(db.Model):
+    __tablename__ = 'student_daily_rollup'
+
+    matric_no = db.Column(db.String(20), primary_key=True)
+    course = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    submissions = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_student_daily_rollup_course_day', 'course', 'day'),
+    )
+
+    def __repr__(self):
+        return f"<StudentDailyRollup {self.matric_no} {self.course} {self.day}>"
+
+
+# Record Change Model (append-only feed of StudentRecord inserts, updates and
+# deletes; its id is the cursor the live records dashboard resumes from)
+class RecordChange(db.Model):
+    __tablename__ = 'record_change'
+
+    id = db.Column(db.Integer, primary_key=True)
+    record_id = db.Column(db.Integer, nullable=False)  # no FK: deleted records stay in the feed
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_record_change_changed_at', 'changed_at'),
+    )
+
+    def __repr__(self):
+        return f"<RecordChange {self.id} {self.record_id}>"
+
+
+# Counter maintenance: every flush that adds, deletes or re-statuses a
+# StudentRecord adjusts attendance_counter in the same transaction, so the
+# dashboard never has to COUNT(*) over student_record
+def _counter_key_change(state, key):
+    history = state.attrs[key].history
+    if history.added:
+        new = history.added[0]
+    elif history.unchanged:
+        new = history.unchanged[0]
+    else:
+        new = getattr(state.obj(), key)
+    old = history.deleted[0] if history.deleted else new
+    return old, new
+
+
+@event.listens_for(db.session, 'after_flush')
+def update_attendance_counters(session, flush_context):
+    deltas = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, StudentRecord):
+            deltas[(obj.course, obj.active)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, StudentRecord):
+            deltas[(obj.course, obj.active)] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, StudentRecord) and session.is_modified(obj):
+            state = inspect(obj)
+            old_course, new_course = _counter_key_change(state, 'course')
+            old_active, new_active = _counter_key_change(state, 'active')
+            if (old_course, old_active) != (new_course, new_active):
+                deltas[(old_course, old_active)] -= 1
+                deltas[(new_course, new_active)] += 1
+
+    apply_counter_deltas(session.connection(), deltas)
+
+
+def apply_counter_deltas(connection, deltas):
+    # deltas maps (course, active) -> change in row count
+    table = AttendanceCounter.__table__
+    for (course, active), delta in deltas.items():
+        # NULL status rows are counted as neither active nor inactive
+        if not delta or active is None:
+            continue
+        result = connection.execute(
+            table.update()
+            .where(table.c.course == course, table.c.active == active)
+            .values(total=table.c.total + delta)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(course=course, active=active, total=delta))
+
+
+def get_attendance_counts(course=None, session_id=None):
+    if session_id:
+        # A single session is counted directly off its (session_id, timestamp) index
+        query = (db.session.query(StudentRecord.active, db.func.count(StudentRecord.id))
+                 .filter(StudentRecord.session_id == session_id)
+                 .group_by(StudentRecord.active))
+    else:
+        query = db.session.query(AttendanceCounter.active, db.func.sum(AttendanceCounter.total))
+        if course:
+            query = query.filter(AttendanceCounter.course == course)
+        query = query.group_by(AttendanceCounter.active)
+    totals = dict(query.all())
+    active = int(totals.get(True) or 0)
+    inactive = int(totals.get(False) or 0)
+    return {'total': active + inactive, 'active': active, 'inactive': inactive}
+
+
+# Rollup maintenance, same scheme as the counters: each flush turns its
+# StudentRecord changes into per (matric_no, course, day) deltas
+@event.listens_for(db.session, 'after_flush')
+def update_attendance_rollups(session, flush_context):
+    deltas = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, StudentRecord):
+            deltas[(obj.matric_no, obj.course, obj.timestamp.date())] += 1
+    for obj in session.deleted:
+        if isinstance(obj, StudentRecord):
+            deltas[(obj.matric_no, obj.course, obj.timestamp.date())] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, StudentRecord) and session.is_modified(obj):
+            state = inspect(obj)
+            old_matric, new_matric = _counter_key_change(state, 'matric_no')
+            old_course, new_course = _counter_key_change(state, 'course')
+            old_timestamp, new_timestamp = _counter_key_change(state, 'timestamp')
+            old_key = (old_matric, old_course, old_timestamp.date())
+            new_key = (new_matric, new_course, new_timestamp.date())
+            if old_key != new_key:
+                deltas[old_key] -= 1
+                deltas[new_key] += 1
+
+    apply_rollup_deltas(session.connection(), deltas)
+
+
+def apply_rollup_deltas(connection, deltas):
+    # deltas maps (matric_no, course, day) -> change in submissions
+    students = StudentDailyRollup.__table__
+    courses = CourseDailyRollup.__table__
+    course_deltas = defaultdict(lambda: [0, 0])  # (course, day) -> [submissions, students]
+    for (matric_no, course, day), delta in deltas.items():
+        if not delta:
+            continue
+        key = and_(students.c.matric_no == matric_no, students.c.course == course, students.c.day == day)
+        course_deltas[(course, day)][0] += delta
+        result = connection.execute(students.update().where(key)
+                                    .values(submissions=students.c.submissions + delta))
+        if result.rowcount == 0:
+            if delta > 0:
+                connection.execute(students.insert().values(matric_no=matric_no, course=course,
+                                                            day=day, submissions=delta))
+                course_deltas[(course, day)][1] += 1
+        elif delta < 0:
+            # Last submission of the day gone: the student no longer counts as present
+            result = connection.execute(students.delete().where(key, students.c.submissions <= 0))
+            course_deltas[(course, day)][1] -= result.rowcount
+
+    for (course, day), (submissions, student_delta) in course_deltas.items():
+        key = and_(courses.c.course == course, courses.c.day == day)
+        result = connection.execute(courses.update().where(key).values(
+            submissions=courses.c.submissions + submissions,
+            students=courses.c.students + student_delta))
+        if result.rowcount == 0:
+            if submissions > 0:
+                connection.execute(courses.insert().values(course=course, day=day,
+                                                           submissions=submissions, students=student_delta))
+        elif submissions < 0:
+            connection.execute(courses.delete().where(key, courses.c.submissions <= 0))
+
+
+# Change feed for the live records dashboard. ORM flushes are logged here;
+# Core inserts/updates call log_record_changes themselves.
+_record_change_writes = 0
+RECORD_CHANGE_PRUNE_EVERY = 500
+
+
+@event.listens_for(db.session, 'after_flush')
+def note_record_changes(session, flush_context):
+    upserts = [obj.id for obj in session.new | session.dirty
+               if isinstance(obj, StudentRecord) and session.is_modified(obj)]
+    deletes = [obj.id for obj in session.deleted if isinstance(obj, StudentRecord)]
+    log_record_changes(session.connection(), upserts)
+    log_record_changes(session.connection(), deletes, deleted=True)
+
+
+def log_record_changes(connection, record_ids, deleted=False):
+    global _record_change_writes
+    if not record_ids:
+        return
+    now = datetime.now()
+    connection.execute(insert(RecordChange),
+                       [{'record_id': record_id, 'deleted': deleted, 'changed_at': now}
+                        for record_id in record_ids])
+    _record_change_writes += 1
+    if _record_change_writes % RECORD_CHANGE_PRUNE_EVERY == 0:
+        # Dashboards only ever need the recent tail of the feed
+        cutoff = now - timedelta(hours=current_app.config['RECORD_CHANGE_RETENTION_HOURS'])
+        connection.execute(RecordChange.__table__.delete().where(RecordChange.changed_at < cutoff))
+
+
+# Course catalog. Submissions store the canonical course code plus its id;
+# lookups are dict hits on a per-process copy of the catalog.
+def load_course_codes():
+    return dict(db.session.execute(select(Course.code, Course.id)).all())
+
+
+def create_course(code):
+    # Own transaction, so a submission that later rolls back can't take a
+    # course the catalog has already cached with it
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(insert(Course).values(code=code, created_at=datetime.now()))
+    except IntegrityError:
+        pass  # added by another worker in the meantime
+    with db.engine.connect() as connection:
+        return connection.execute(select(Course.id).where(Course.code == code)).scalar_one()
+
+
+# fuzzy_cutoff is set from COURSE_FUZZY_CUTOFF in create_app()
+course_catalog = CourseCatalog(load_course_codes, create_course)
+
+
+def resolve_course(raw, create=None, fuzzy=True):
+    # (course id, canonical code); raises ValueError for an unknown course
+    # when it may not be created
+    if create is None:
+        create = current_app.config['COURSE_AUTO_CREATE']
+    code = canonical_course_code(raw)
+    if not code:
+        raise ValueError('Course is required!')
+    if len(code) > 50:
+        raise ValueError('Course code must be at most 50 characters')
+    course_id, code = course_catalog.resolve(code, create=create, fuzzy=fuzzy)
+    if course_id is None:
+        raise ValueError(f'Unknown course {code}')
+    return course_id, code
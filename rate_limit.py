@@ -0,0 +1,190 @@
+"""Token-bucket rate limits and an admission gate for expensive routes.
+
+``init_rate_limits(app, endpoints)`` guards POSTs to the given endpoints.
+Each endpoint maps to a config prefix, and endpoints that share a prefix
+share buckets. A request takes one token each from the buckets for its
+user (``<PREFIX>_LIMIT_USER``: the logged-in user, or the username tried
+at login, from whatever address), its client address
+(``<PREFIX>_LIMIT_IP``) and the process as a whole
+(``<PREFIX>_LIMIT_GLOBAL``). Limits are written ``"count/period"`` with a
+period of second, minute or hour; count is also the burst size, and an
+empty limit turns that bucket off. A request that finds a bucket empty
+gets a 429 with Retry-After, as JSON for XMLHttpRequests. Form posts to an
+endpoint listed in ``form_pages`` are flashed the message and redirected
+to that endpoint's form page instead.
+
+Buckets live in a backend; ``MemoryBackend`` keeps them in this process,
+so with several gunicorn workers each allows the full rate.
+RATE_LIMIT_BACKEND may instead name a factory (``'package.module:Factory'``)
+for a shared store. A backend only needs ``take(key, rate, burst)``,
+returning 0 when a token was taken, else the seconds until one will be.
+
+Admitted requests then pass an ``AdmissionGate``. At most
+ADMISSION_MAX_ACTIVE of them run at once per process, ADMISSION_MAX_WAITING
+more wait up to ADMISSION_WAIT_SECONDS for a slot, and the rest get a 503
+straight away. A burst is shed at the door instead of piling up in
+gunicorn's queues while every thread is busy. Endpoints listed in
+ADMISSION_EXEMPT skip the gate but are still rate limited.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import flash, g, jsonify, redirect, request, url_for
+from flask_login import current_user
+from werkzeug.utils import import_string
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+SHED_RETRY_AFTER_SECONDS = 5
+
+Rate = namedtuple('Rate', ['per_second', 'burst'])
+
+
+def parse_rate(text):
+    # '20/minute' -> Rate(20 / 60, 20); empty -> None
+    text = (text or '').strip()
+    if not text:
+        return None
+    count, _, period = text.partition('/')
+    try:
+        count = int(count)
+        seconds = PERIODS[period.strip().lower().rstrip('s')]
+    except (ValueError, KeyError):
+        raise ValueError(f'Rate limit must look like "10/minute", got {text!r}') from None
+    if count <= 0:
+        raise ValueError(f'Rate limit count must be positive, got {text!r}')
+    return Rate(count / seconds, count)
+
+
+class MemoryBackend:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # The least recently used buckets have had the longest to refill
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+def load_backend(spec, max_keys=100000):
+    if spec in (None, '', 'memory'):
+        return MemoryBackend(max_keys)
+    return import_string(spec)()
+
+
+class AdmissionGate:
+    def __init__(self, max_active, max_waiting):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        # True once the caller holds a slot; False to shed the request
+        with self._cond:
+            if self.active < self.max_active:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_waiting:
+                return False
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + timeout
+                while self.active >= self.max_active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+def init_rate_limits(app, endpoints, form_pages=None):
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('RATE_LIMIT_BACKEND', 'memory')
+    app.config.setdefault('RATE_LIMIT_MAX_KEYS', 100000)
+    app.config.setdefault('ADMISSION_MAX_ACTIVE', 0)
+    app.config.setdefault('ADMISSION_MAX_WAITING', 0)
+    app.config.setdefault('ADMISSION_WAIT_SECONDS', 0.0)
+    app.config.setdefault('ADMISSION_EXEMPT', ())
+
+    backend = load_backend(app.config['RATE_LIMIT_BACKEND'], app.config['RATE_LIMIT_MAX_KEYS'])
+    rates = {}
+    for prefix in set(endpoints.values()):
+        for scope in ('USER', 'IP', 'GLOBAL'):
+            rates[(prefix, scope)] = parse_rate(app.config.get(f'{prefix}_LIMIT_{scope}'))
+    gate = None
+    if app.config['ADMISSION_MAX_ACTIVE'] > 0:
+        gate = AdmissionGate(app.config['ADMISSION_MAX_ACTIVE'], app.config['ADMISSION_MAX_WAITING'])
+    app.extensions['rate_limit'] = backend
+
+    def user_key():
+        if current_user.is_authenticated:
+            return f'id:{current_user.get_id()}'
+        # Per account, so guesses spread over many addresses still add up
+        username = (request.form.get('username') or '').strip().lower()
+        return f'name:{username}' if username else None
+
+    form_pages = form_pages or {}
+
+    def refuse(status, message, retry_after):
+        page = form_pages.get(request.endpoint)
+        if page is None or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            response = jsonify({'success': False, 'message': message})
+            response.status_code = status
+        else:
+            # A browser only follows the redirect on a 3xx status
+            flash(message, 'danger')
+            response = redirect(url_for(page))
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    @app.before_request
+    def limit_request_rate():
+        prefix = endpoints.get(request.endpoint)
+        if prefix is None or request.method != 'POST':
+            return None
+        if app.config['RATE_LIMIT_ENABLED']:
+            # Narrowest scope first, so a refused client doesn't use up the global bucket
+            for scope, key in (('USER', user_key()), ('IP', request.remote_addr), ('GLOBAL', '')):
+                rate = rates[(prefix, scope)]
+                if rate is None or key is None:
+                    continue
+                wait = backend.take(f'{prefix}:{scope}:{key}', rate.per_second, rate.burst)
+                if wait:
+                    return refuse(429, 'Too many requests, please wait and try again', wait)
+        if gate is not None and request.endpoint not in app.config['ADMISSION_EXEMPT']:
+            if not gate.acquire(app.config['ADMISSION_WAIT_SECONDS']):
+                return refuse(503, 'The server is busy, please try again shortly', SHED_RETRY_AFTER_SECONDS)
+            g.admission_slot = True
+        return None
+
+    @app.teardown_request
+    def release_admission_slot(exc):
+        if g.pop('admission_slot', False):
+            gate.release()
+
+    return backend
@@ -0,0 +1,763 @@
+"""Records dashboard, analytics, the semester archive and counter maintenance."""
+import base64
+import heapq
+import json
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+from itertools import groupby
+
+import click
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, current_app, stream_with_context
+from flask_login import login_required, current_user
+from sqlalchemy import and_, or_, insert, select
+
+from archive import Archive
+from courses import canonical_course_code
+from extensions import db
+from geofence import LOCATION_FLAGS
+from models import (Attendance, AttendanceCounter, CourseDailyRollup, RecordChange, StudentDailyRollup,
+                    StudentRecord, apply_counter_deltas, course_catalog, get_attendance_counts,
+                    log_record_changes)
+
+bp = Blueprint('records', __name__, cli_group=None)
+
+
+# Records pagination helpers
+RECORDS_PER_PAGE = 50
+RECORDS_MAX_PER_PAGE = 200
+
+
+def parse_record_filters(args):
+    # Raises ValueError with a user-facing message on bad input
+    filters = {
+        'archive': str(args.get('archive') or '').strip().lower() in ('1', 'true', 'yes'),
+        'course': course_catalog.lookup(args.get('course'))[1] or None,
+        'status': (args.get('status') or '').strip().lower() or None,
+        'start_date': None,
+        'end_date': None,
+        'session_id': None,
+        'location': (args.get('location') or '').strip().lower() or None,
+    }
+    if filters['status'] not in (None, 'active', 'inactive'):
+        raise ValueError('Status must be "active" or "inactive"')
+    if filters['location'] not in (None, 'unchecked') + LOCATION_FLAGS:
+        raise ValueError(f'Location must be one of: {", ".join(LOCATION_FLAGS)}, unchecked')
+    session_id = str(args.get('session_id') or '').strip()
+    if session_id:
+        try:
+            filters['session_id'] = int(session_id)
+        except ValueError:
+            raise ValueError('session_id must be a number')
+    for key in ('start_date', 'end_date'):
+        value = (args.get(key) or '').strip()
+        if value:
+            try:
+                filters[key] = datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f'{key} must be a date in YYYY-MM-DD format')
+    return filters
+
+
+def filter_records_query(query, filters):
+    if filters.get('session_id'):
+        query = query.filter(StudentRecord.session_id == filters['session_id'])
+    if filters.get('course'):
+        query = query.filter(StudentRecord.course == filters['course'])
+    if filters.get('status') == 'active':
+        query = query.filter(StudentRecord.active.is_(True))
+    elif filters.get('status') == 'inactive':
+        query = query.filter(StudentRecord.active.is_(False))
+    if filters.get('location') == 'unchecked':
+        query = query.filter(StudentRecord.location_flag.is_(None))
+    elif filters.get('location'):
+        query = query.filter(StudentRecord.location_flag == filters['location'])
+    if filters.get('start_date'):
+        query = query.filter(StudentRecord.timestamp >= filters['start_date'])
+    if filters.get('end_date'):
+        # end_date is inclusive of the whole day
+        query = query.filter(StudentRecord.timestamp < filters['end_date'] + timedelta(days=1))
+    return query
+
+
+def encode_records_cursor(record):
+    raw = f"{record.timestamp.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_records_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, record_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid page cursor')
+
+
+def records_page_query(filters, cursor=None, per_page=RECORDS_PER_PAGE):
+    # Keyset pagination on (timestamp, id) so each page costs the same
+    # no matter how deep into the table it is
+    query = filter_records_query(StudentRecord.query, filters)
+    if cursor:
+        timestamp, record_id = decode_records_cursor(cursor)
+        query = query.filter(or_(
+            StudentRecord.timestamp < timestamp,
+            and_(StudentRecord.timestamp == timestamp, StudentRecord.id < record_id)
+        ))
+    # One extra row tells us whether there is a next page
+    return (query.order_by(StudentRecord.timestamp.desc(), StudentRecord.id.desc())
+            .limit(per_page + 1))
+
+
+def paginate_records(filters, cursor=None, per_page=RECORDS_PER_PAGE):
+    rows = records_page_query(filters, cursor, per_page).all()
+    page = rows[:per_page]
+    next_cursor = encode_records_cursor(page[-1]) if len(rows) > per_page else None
+    return page, next_cursor
+
+
+def parse_per_page(args):
+    try:
+        per_page = int(args.get('per_page', RECORDS_PER_PAGE))
+    except ValueError:
+        raise ValueError('per_page must be a number')
+    return max(1, min(per_page, RECORDS_MAX_PER_PAGE))
+
+
+def record_to_dict(record):
+    return {
+        'id': record.id,
+        'name': record.name,
+        'matric_no': record.matric_no,
+        'course': record.course,
+        'timestamp': record.timestamp.isoformat(),
+        'session_id': record.session_id,
+        'active': bool(record.active),
+        'latitude': record.latitude,
+        'longitude': record.longitude,
+        'accuracy': record.accuracy,
+        'location_name': record.location_name,
+        'location_flag': record.location_flag,
+        'location_distance_m': record.location_distance_m
+    }
+
+
+# Records Route (Protected)
+@bp.route('/records')
+@login_required
+def records():
+    if current_user.role != 'lecturer':
+        flash('You need lecturer privileges to access this page', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    try:
+        filters = parse_record_filters(request.args)
+        per_page = parse_per_page(request.args)
+        # Read before the page so no change between the two is missed
+        live_cursor = settled_change_cursor()
+        page_records, next_cursor = paginate_records(filters, request.args.get('cursor'), per_page)
+    except ValueError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('records.records'))
+
+    counts = get_attendance_counts(filters['course'], filters['session_id'])
+
+    # Query args without the cursor, reused by the filter form and page links
+    filter_args = {k: v for k, v in request.args.items() if k != 'cursor' and v}
+    
+    return render_template('records.html', 
+                         records=page_records,
+                         next_cursor=next_cursor,
+                         is_first_page=not request.args.get('cursor'),
+                         filters=filters,
+                         filter_args=filter_args,
+                         live_cursor=live_cursor,
+                         active_count=counts['active'],
+                         inactive_count=counts['inactive'])
+
+@bp.route('/records/data')
+@login_required
+def records_data():
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    try:
+        filters = parse_record_filters(request.args)
+        per_page = parse_per_page(request.args)
+        page_records, next_cursor = paginate_records(filters, request.args.get('cursor'), per_page)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    return jsonify({
+        'success': True,
+        'records': [record_to_dict(record) for record in page_records],
+        'next_cursor': next_cursor
+    })
+
+# Live records dashboard: deltas from the record_change feed. Ids are handed
+# out before commit, so on PostgreSQL a slower transaction can commit a lower
+# id after a higher one is visible. A gap in the ids is held back until it
+# fills or is LIVE_CHANGE_SETTLE_SECONDS old (a rolled-back transaction's id
+# never fills); re-sent changes are harmless, as the dashboard replaces rows
+# by id.
+LIVE_MAX_CHANGES = 200
+LIVE_CHANGE_SETTLE_SECONDS = 10
+
+
+def settled_change_cursor():
+    # A cursor a settle period back, for a page that starts following the
+    # feed; its first delta re-reads the recent tail in case one filled a gap
+    cutoff = datetime.now() - timedelta(seconds=LIVE_CHANGE_SETTLE_SECONDS)
+    return (db.session.query(RecordChange.id)
+            .filter(RecordChange.changed_at < cutoff)
+            .order_by(RecordChange.changed_at.desc(), RecordChange.id.desc())
+            .limit(1)
+            .scalar()) or 0
+
+
+def parse_change_cursor(value):
+    try:
+        return max(int(value or 0), 0)
+    except ValueError:
+        raise ValueError('Invalid change cursor')
+
+
+def record_changes_since(cursor, filters):
+    # Returns None if nothing changed after cursor. Otherwise the changed
+    # records that match filters (with their table row pre-rendered), the
+    # ids to drop from the table, fresh counts and the new cursor.
+    changes = (db.session.query(RecordChange.id, RecordChange.record_id, RecordChange.deleted,
+                                RecordChange.changed_at)
+               .filter(RecordChange.id > cursor)
+               .order_by(RecordChange.id)
+               .limit(LIVE_MAX_CHANGES)
+               .all())
+    if not changes:
+        return None
+    if cursor and changes[0][0] > cursor + 1:
+        oldest = db.session.query(db.func.min(RecordChange.id)).scalar()
+        if oldest > cursor + 1:
+            # The feed was pruned past this client; it has to reload
+            return {'reset': True, 'cursor': settled_change_cursor()}
+
+    more = len(changes) == LIVE_MAX_CHANGES
+    settled = datetime.now() - timedelta(seconds=LIVE_CHANGE_SETTLE_SECONDS)
+    expected = cursor + 1 if cursor else changes[0][0]
+    for idx, (change_id, _, _, changed_at) in enumerate(changes):
+        if change_id != expected and changed_at > settled:
+            # An earlier id may still commit; stop the cursor before it
+            changes, more = changes[:idx], False
+            break
+        expected = change_id + 1
+    if not changes:
+        return None
+
+    latest = {}
+    for _, record_id, deleted, _ in changes:
+        latest[record_id] = deleted  # the last change to a record wins
+    upsert_ids = [record_id for record_id, deleted in latest.items() if not deleted]
+    changed_records = []
+    if upsert_ids:
+        changed_records = (filter_records_query(StudentRecord.query, filters)
+                           .filter(StudentRecord.id.in_(upsert_ids))
+                           .order_by(StudentRecord.timestamp, StudentRecord.id)
+                           .all())
+    found = {record.id for record in changed_records}
+    return {
+        'cursor': changes[-1][0],
+        'records': [dict(record_to_dict(record),
+                         html=render_template('_record_row.html', record=record, index=''))
+                    for record in changed_records],
+        # Deleted, or changed so that they no longer match the filters
+        'removed': [record_id for record_id in latest if record_id not in found],
+        'counts': get_attendance_counts(filters['course'], filters['session_id']),
+        'more': more
+    }
+
+
+@bp.route('/records/changes')
+@login_required
+def records_changes():
+    # Polling fallback for browsers without EventSource
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    try:
+        filters = parse_record_filters(request.args)
+        cursor = parse_change_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    delta = record_changes_since(cursor, filters) or {'cursor': cursor, 'records': [], 'removed': []}
+    return jsonify(dict(delta, success=True))
+
+
+@bp.route('/records/stream')
+@login_required
+def records_stream():
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    try:
+        filters = parse_record_filters(request.args)
+        # EventSource sends the last id it saw when it reconnects
+        cursor = parse_change_cursor(request.headers.get('Last-Event-ID') or request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    def generate(cursor):
+        # Each response ends after LIVE_STREAM_SECONDS and the browser
+        # reconnects, so a worker is never tied up by one dashboard for long
+        poll_seconds = current_app.config['LIVE_POLL_SECONDS']
+        deadline = time.monotonic() + current_app.config['LIVE_STREAM_SECONDS']
+        yield f"retry: {int(poll_seconds * 1000)}\n\n"
+        while True:
+            delta = record_changes_since(cursor, filters)
+            # Give the pooled connection back while we wait
+            db.session.close()
+            if delta:
+                cursor = delta['cursor']
+                yield f"id: {cursor}\nevent: records\ndata: {json.dumps(delta)}\n\n"
+                if delta.get('reset'):
+                    return
+                if delta['more']:
+                    continue
+            else:
+                yield ": keep-alive\n\n"
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(poll_seconds)
+
+    return Response(stream_with_context(generate(cursor)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Analytics: attendance rates and trends, read only from the daily rollups
+ANALYTICS_MAX_STUDENTS = 5000
+
+
+def filter_rollup_days(query, day_column, filters):
+    if filters.get('start_date'):
+        query = query.filter(day_column >= filters['start_date'].date())
+    if filters.get('end_date'):
+        query = query.filter(day_column <= filters['end_date'].date())
+    return query
+
+
+@bp.route('/analytics/courses')
+@login_required
+def analytics_courses():
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    try:
+        filters = parse_record_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    query = db.session.query(CourseDailyRollup.course,
+                             db.func.count(CourseDailyRollup.day),
+                             db.func.sum(CourseDailyRollup.submissions),
+                             db.func.avg(CourseDailyRollup.students),
+                             db.func.max(CourseDailyRollup.day))
+    query = filter_rollup_days(query, CourseDailyRollup.day, filters)
+    rows = query.group_by(CourseDailyRollup.course).order_by(CourseDailyRollup.course).all()
+    return jsonify({
+        'success': True,
+        'courses': [{
+            'course': course,
+            'days': days,
+            'submissions': int(submissions or 0),
+            'average_students': round(float(average or 0), 1),
+            'last_day': last_day.isoformat() if last_day else None
+        } for course, days, submissions, average, last_day in rows]
+    })
+
+
+@bp.route('/analytics/trend')
+@login_required
+def analytics_trend():
+    # Daily submissions and distinct students, for one course or all of them
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    try:
+        filters = parse_record_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    query = db.session.query(CourseDailyRollup.day,
+                             db.func.sum(CourseDailyRollup.submissions),
+                             db.func.sum(CourseDailyRollup.students))
+    if filters['course']:
+        query = query.filter(CourseDailyRollup.course == filters['course'])
+    query = filter_rollup_days(query, CourseDailyRollup.day, filters)
+    rows = query.group_by(CourseDailyRollup.day).order_by(CourseDailyRollup.day).all()
+    return jsonify({
+        'success': True,
+        'course': filters['course'],
+        'days': [{'day': day.isoformat(), 'submissions': int(submissions), 'students': int(students)}
+                 for day, submissions, students in rows]
+    })
+
+
+@bp.route('/analytics/rates')
+@login_required
+def analytics_rates():
+    # Per-student attendance rate in a course: days attended / days the course met
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    try:
+        filters = parse_record_filters(request.args)
+        max_rate = request.args.get('max_rate', type=float)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if not filters['course']:
+        return jsonify({'success': False, 'message': 'Course is required!'}), 400
+
+    course_days = filter_rollup_days(
+        db.session.query(db.func.count(CourseDailyRollup.day))
+        .filter(CourseDailyRollup.course == filters['course']),
+        CourseDailyRollup.day, filters).scalar() or 0
+
+    days_attended = db.func.count(StudentDailyRollup.day)
+    query = (db.session.query(StudentDailyRollup.matric_no, days_attended,
+                              db.func.sum(StudentDailyRollup.submissions),
+                              db.func.max(StudentDailyRollup.day))
+             .filter(StudentDailyRollup.course == filters['course']))
+    query = filter_rollup_days(query, StudentDailyRollup.day, filters)
+    if max_rate is not None and course_days:
+        query = query.having(days_attended <= max_rate * course_days)
+    rows = (query.group_by(StudentDailyRollup.matric_no)
+            .order_by(days_attended, StudentDailyRollup.matric_no)
+            .limit(ANALYTICS_MAX_STUDENTS)
+            .all())
+    return jsonify({
+        'success': True,
+        'course': filters['course'],
+        'course_days': course_days,
+        'students': [{
+            'matric_no': matric_no,
+            'days_attended': days,
+            'submissions': int(submissions),
+            'rate': round(days / course_days, 4) if course_days else None,
+            'last_day': last_day.isoformat()
+        } for matric_no, days, submissions, last_day in rows]
+    })
+
+
+@bp.route('/analytics/student')
+@login_required
+def analytics_student():
+    # One student's attendance rate in each of their courses
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    matric_no = (request.args.get('matric_no') or '').strip()
+    if not matric_no:
+        return jsonify({'success': False, 'message': 'Matric Number is required!'}), 400
+    try:
+        filters = parse_record_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    attended = filter_rollup_days(
+        db.session.query(StudentDailyRollup.course, db.func.count(StudentDailyRollup.day),
+                         db.func.max(StudentDailyRollup.day))
+        .filter(StudentDailyRollup.matric_no == matric_no),
+        StudentDailyRollup.day, filters).group_by(StudentDailyRollup.course).all()
+    courses = [course for course, _, _ in attended]
+    course_days = {}
+    if courses:
+        course_days = dict(filter_rollup_days(
+            db.session.query(CourseDailyRollup.course, db.func.count(CourseDailyRollup.day))
+            .filter(CourseDailyRollup.course.in_(courses)),
+            CourseDailyRollup.day, filters).group_by(CourseDailyRollup.course).all())
+    return jsonify({
+        'success': True,
+        'matric_no': matric_no,
+        'courses': [{
+            'course': course,
+            'days_attended': days,
+            'course_days': course_days.get(course, 0),
+            'rate': round(days / course_days[course], 4) if course_days.get(course) else None,
+            'last_day': last_day.isoformat()
+        } for course, days, last_day in attended]
+    })
+
+
+# Semester archive. Closed semesters' student_record and attendance rows are
+# moved into columnar files under ARCHIVE_DIR (see archive.py), one
+# partition per table, semester and course; exports read them back with
+# ?archive=1 instead of the rows being reloaded into the database.
+# numpy is imported inside the functions that read parts, so workers that
+# never touch the archive don't load it.
+ARCHIVED_MODELS = (StudentRecord, Attendance)
+ARCHIVE_DELETE_BATCH = 500
+record_archive = Archive(None)  # root: ARCHIVE_DIR, set in create_app()
+ArchivedRecord = namedtuple('ArchivedRecord', [column.name for column in StudentRecord.__table__.columns])
+
+
+def semester_bounds(at):
+    # (label, start, end) of the semester holding `at`; the label is the
+    # month it starts, e.g. '2025-09'
+    months = sorted({int(month) for month in current_app.config['SEMESTER_START_MONTHS'].split(',')})
+    starts = [datetime(at.year + offset, month, 1) for offset in (-1, 0, 1) for month in months]
+    start = max(value for value in starts if value <= at)
+    end = min(value for value in starts if value > at)
+    return start.strftime('%Y-%m'), start, end
+
+
+def archive_column_kind(column):
+    if isinstance(column.type, db.Boolean):
+        return 'bool'
+    if isinstance(column.type, db.DateTime):
+        return 'datetime'
+    if isinstance(column.type, db.Float):
+        return 'float'
+    if isinstance(column.type, db.Integer):
+        return 'int'
+    return 'str'
+
+
+def archive_course_rows(model, semester, course, rows):
+    # Writes one part, deletes its rows and commits; the part is published
+    # before the commit, so a failure can leave rows in both places but
+    # never in neither
+    table = model.__table__
+    staged = record_archive.stage(table.name, semester, course, [
+        (column.name, archive_column_kind(column), [row[i] for row in rows])
+        for i, column in enumerate(table.columns)
+    ])
+    try:
+        ids = [row.id for row in rows]
+        for offset in range(0, len(ids), ARCHIVE_DELETE_BATCH):
+            db.session.execute(table.delete().where(table.c.id.in_(ids[offset:offset + ARCHIVE_DELETE_BATCH])))
+        if model is StudentRecord:
+            # Core deletes skip the flush hooks. The live counters and the
+            # change feed follow the rows out; the daily rollups keep them,
+            # since analytics cover archived semesters too.
+            deltas = Counter((row.course, row.active) for row in rows)
+            apply_counter_deltas(db.session.connection(), {key: -total for key, total in deltas.items()})
+            log_record_changes(db.session.connection(), ids, deleted=True)
+        staged.publish()
+    except BaseException:
+        db.session.rollback()
+        staged.discard()
+        raise
+    db.session.commit()
+
+
+def archive_semesters(before, dry_run=False):
+    # Archives every semester that ended by the start of the semester
+    # holding `before`, one course at a time. Returns
+    # {(table, semester): rows moved}.
+    _, cutoff, _ = semester_bounds(before)
+    moved = Counter()
+    for model in ARCHIVED_MODELS:
+        table = model.__table__
+        oldest = db.session.execute(select(db.func.min(table.c.timestamp))).scalar()
+        while oldest is not None and oldest < cutoff:
+            semester, start, end = semester_bounds(oldest)
+            in_semester = and_(table.c.timestamp >= start, table.c.timestamp < end)
+            courses = db.session.execute(select(table.c.course, db.func.count(table.c.id))
+                                         .where(in_semester).group_by(table.c.course)).all()
+            for course, total in courses:
+                moved[(table.name, semester)] += total
+                if dry_run:
+                    continue
+                # Stored newest first, the order exports read them in
+                rows = db.session.execute(select(table).where(in_semester, table.c.course == course)
+                                          .order_by(table.c.timestamp.desc(), table.c.id.desc())).all()
+                archive_course_rows(model, semester, course, rows)
+            oldest = db.session.execute(select(db.func.min(table.c.timestamp))
+                                        .where(table.c.timestamp >= end)).scalar()
+    if moved and not dry_run:
+        record_archive.bump_generation()
+    return moved
+
+
+def archive_filter_mask(part, filters):
+    # parse_record_filters() filters as a row mask over one archive part
+    import numpy as np
+    mask = np.ones(part.rows, dtype=bool)
+    if filters.get('session_id'):
+        mask &= part.equals('session_id', filters['session_id'])
+    if filters.get('status'):
+        mask &= part.equals('active', filters['status'] == 'active')
+    if filters.get('location') == 'unchecked':
+        mask &= part.equals('location_flag', None)
+    elif filters.get('location'):
+        mask &= part.equals('location_flag', filters['location'])
+    timestamps = part.column('timestamp')
+    if filters.get('start_date'):
+        mask &= timestamps >= np.datetime64(filters['start_date'], 'us')
+    if filters.get('end_date'):
+        mask &= timestamps < np.datetime64(filters['end_date'] + timedelta(days=1), 'us')
+    return mask
+
+
+def iter_archived_records(filters):
+    # Archived student_record rows matching filters, newest first, with the
+    # same attributes as StudentRecord. Each part is already newest first,
+    # so a semester's parts are merged rather than sorted.
+    # Parts archived before course codes were canonicalised may be filed
+    # under the raw spelling, so match on the canonical code
+    import numpy as np
+    parts = [part for part in record_archive.parts('student_record')
+             if not filters.get('course') or canonical_course_code(part.course) == filters['course']]
+    for _, semester_parts in groupby(parts, key=lambda part: part.semester):
+        streams = [part.iter_rows(np.flatnonzero(archive_filter_mask(part, filters)), ArchivedRecord)
+                   for part in semester_parts]
+        yield from heapq.merge(*streams, key=lambda record: (record.timestamp, record.id), reverse=True)
+
+
+def archived_rollup_counts():
+    # {(matric_no, course, day): submissions} over the archived student_record rows
+    import numpy as np
+    counts = Counter()
+    epoch = date(1970, 1, 1).toordinal()
+    for part in record_archive.parts('student_record'):
+        days = np.asarray(part.column('timestamp')).astype('datetime64[D]').astype(np.int64)
+        codes = np.asarray(part.column('matric_no')).astype(np.int64)
+        pairs, totals = np.unique(np.stack([codes, days], axis=1), axis=0, return_counts=True)
+        matric_nos = part.dictionary('matric_no')
+        for (code, day), total in zip(pairs.tolist(), totals.tolist()):
+            counts[(matric_nos[code], canonical_course_code(part.course), date.fromordinal(epoch + day))] += total
+    return counts
+
+
+@bp.cli.command('archive-semesters')
+@click.option('--before', default=None,
+              help='Archive semesters that ended by the start of the semester holding this date (YYYY-MM-DD, default today)')
+@click.option('--dry-run', is_flag=True, help='Only report what would be archived')
+@click.option('--vacuum', is_flag=True, help='VACUUM the SQLite database afterwards to shrink the file')
+def archive_semesters_command(before, dry_run, vacuum):
+    """Move closed semesters' records out of the database into the columnar archive."""
+    before = datetime.strptime(before, '%Y-%m-%d') if before else datetime.now()
+    moved = archive_semesters(before, dry_run=dry_run)
+    for (table, semester), total in sorted(moved.items()):
+        print(f"{table} {semester}: {total} rows{' (dry run)' if dry_run else ''}")
+    if not moved:
+        print('Nothing to archive.')
+    if vacuum and not dry_run and db.engine.dialect.name == 'sqlite':
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('VACUUM')
+
+
+# Archive Route (Protected)
+@bp.route('/archive')
+@login_required
+def archive_index():
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    table = request.args.get('table', 'student_record')
+    if table not in {model.__table__.name for model in ARCHIVED_MODELS}:
+        return jsonify({'success': False, 'message': 'Unknown table'}), 400
+
+    partitions = defaultdict(lambda: {'rows': 0, 'parts': 0})
+    for part in record_archive.parts(table, course=request.args.get('course') or None):
+        partition = partitions[(part.semester, part.course)]
+        partition['rows'] += part.rows
+        partition['parts'] += 1
+    return jsonify({
+        'success': True,
+        'table': table,
+        'partitions': [dict(semester=semester, course=course, **totals)
+                       for (semester, course), totals in partitions.items()]
+    })
+
+
+def rebuild_attendance_counters():
+    # Needed after bulk query.update()/delete() calls, which skip flush events
+    db.session.query(AttendanceCounter).delete()
+    rows = (db.session.query(StudentRecord.course, StudentRecord.active, db.func.count(StudentRecord.id))
+            .filter(StudentRecord.active.isnot(None))
+            .group_by(StudentRecord.course, StudentRecord.active)
+            .all())
+    db.session.add_all([AttendanceCounter(course=course, active=active, total=total)
+                        for course, active, total in rows])
+    db.session.commit()
+
+
+@bp.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Recompute attendance_counter from student_record."""
+    rebuild_attendance_counters()
+    print('Attendance counters rebuilt.')
+
+
+def rebuild_attendance_rollups():
+    # Needed after bulk query.update()/delete() calls, which skip flush events
+    db.session.query(StudentDailyRollup).delete()
+    db.session.query(CourseDailyRollup).delete()
+    day = db.func.date(StudentRecord.timestamp)
+    rows = (db.session.query(StudentRecord.matric_no, StudentRecord.course, day, db.func.count(StudentRecord.id))
+            .group_by(StudentRecord.matric_no, StudentRecord.course, day)
+            .all())
+    # Archived semesters left student_record but stay in the rollups
+    counts = archived_rollup_counts()
+    for matric_no, course, row_day, submissions in rows:
+        # SQLite's date() returns text
+        row_day = row_day if isinstance(row_day, date) else date.fromisoformat(row_day)
+        counts[(matric_no, course, row_day)] += submissions
+    course_rows = defaultdict(lambda: [0, 0])
+    student_rows = []
+    for (matric_no, course, row_day), submissions in counts.items():
+        student_rows.append({'matric_no': matric_no, 'course': course, 'day': row_day,
+                             'submissions': submissions})
+        course_rows[(course, row_day)][0] += submissions
+        course_rows[(course, row_day)][1] += 1
+    if student_rows:
+        db.session.execute(insert(StudentDailyRollup), student_rows)
+        db.session.execute(insert(CourseDailyRollup),
+                           [{'course': course, 'day': row_day, 'submissions': submissions, 'students': students}
+                            for (course, row_day), (submissions, students) in course_rows.items()])
+    db.session.commit()
+
+
+@bp.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the daily course and student rollups from student_record and the archive."""
+    rebuild_attendance_rollups()
+    print('Attendance rollups rebuilt.')
+
+
+# Delete record route
+@bp.route('/delete_record/<int:record_id>', methods=['POST'])
+@login_required
+def delete_record(record_id):
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    
+    record = StudentRecord.query.get_or_404(record_id)
+    db.session.delete(record)
+    db.session.commit()
+    return jsonify({
+        'success': True,
+        'message': 'Record deleted successfully',
+        'new_counts': get_attendance_counts()
+    })
+        
+
+
+@bp.route('/toggle_status/<student_id>', methods=['POST'])
+@login_required
+def toggle_status(student_id):
+    if current_user.role != 'lecturer':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        new_status = data.get('new_status') == 'active'
+        
+        # Update the attendance record status shown on the records page
+        record = db.session.get(StudentRecord, int(student_id)) if student_id.isdigit() else None
+        if record:
+            record.active = new_status
+            db.session.commit()
+            
+            return jsonify({
+                'success': True,
+                'message': 'Status updated successfully',
+                'new_status': new_status,
+                'new_counts': get_attendance_counts()
+            })
+    
+    return jsonify({'success': False, 'message': 'Invalid request'}), 400
@@ -0,0 +1,105 @@
+"""Time budgets for requests, set per route class.
+
+``init_request_timeouts(app, route_classes)`` maps each endpoint to a class
+(an exact endpoint first, then its blueprint, else ``read``) and gives the
+request a deadline from ``REQUEST_TIMEOUT_<CLASS>`` seconds (0 disables).
+Database work that runs past the deadline is interrupted: through a
+progress handler on SQLite connections, and ``SET LOCAL statement_timeout``
+on PostgreSQL. The request then gets a 503 with Retry-After instead of
+holding a worker thread, even if the view caught the error itself.
+Python-only work such as PDF layout, waiting on a SQLite lock
+(SQLITE_BUSY_TIMEOUT_MS bounds that) and sending a streamed body after the
+view returns are not covered.
+
+The deadline is kept in a thread-local rather than ``flask.g`` because
+SQLite calls the progress handler from inside every long query.
+"""
+import sqlite3
+import threading
+import time
+
+from flask import jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+PROGRESS_OPS = 10000  # SQLite VM steps between deadline checks
+RETRY_AFTER_SECONDS = 5
+
+_local = threading.local()
+
+
+def remaining_seconds():
+    # Seconds left for this thread's request, or None without a deadline
+    deadline = getattr(_local, 'deadline', None)
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _past_deadline():
+    deadline = getattr(_local, 'deadline', None)
+    return deadline is not None and time.monotonic() > deadline
+
+
+@event.listens_for(Engine, 'connect')
+def install_progress_handler(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        # A true return value aborts the running statement with "interrupted"
+        dbapi_connection.set_progress_handler(_past_deadline, PROGRESS_OPS)
+
+
+@event.listens_for(Engine, 'handle_error')
+def note_interrupted(context):
+    if getattr(_local, 'deadline', None) is None:
+        return
+    error = context.original_exception
+    if (getattr(error, 'sqlite_errorcode', None) == sqlite3.SQLITE_INTERRUPT
+            or getattr(error, 'pgcode', None) == '57014'):  # query_canceled
+        _local.timed_out = True
+
+
+@event.listens_for(Engine, 'begin')
+def set_statement_timeout(conn):
+    remaining = remaining_seconds()
+    if remaining is not None and conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql(f'SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}')
+
+
+def init_request_timeouts(app, route_classes):
+    def route_class(endpoint):
+        if endpoint is None:
+            return 'read'
+        return route_classes.get(endpoint) or route_classes.get(endpoint.partition('.')[0]) or 'read'
+
+    def timeout_response():
+        response = jsonify({'success': False, 'message': 'The server is busy, please try again shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        return response
+
+    @app.before_request
+    def start_request_deadline():
+        budget = app.config.get(f'REQUEST_TIMEOUT_{route_class(request.endpoint).upper()}', 0)
+        _local.deadline = time.monotonic() + budget if budget > 0 else None
+        _local.timed_out = False
+
+    @app.after_request
+    def finish_request_deadline(response):
+        # The view is done; streaming the body is not limited
+        _local.deadline = None
+        if getattr(_local, 'timed_out', False):
+            _local.timed_out = False
+            app.logger.warning(f"Request over its {route_class(request.endpoint)} time budget: "
+                               f"{request.method} {request.path}")
+            return timeout_response()
+        return response
+
+    @app.teardown_request
+    def drop_request_deadline(exc):
+        _local.deadline = None
+        _local.timed_out = False
+
+    @app.errorhandler(OperationalError)
+    def request_timed_out(error):
+        if not getattr(_local, 'timed_out', False):
+            raise error
+        return timeout_response()  # logged in finish_request_deadline
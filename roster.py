@@ -0,0 +1,57 @@
+"""In-memory index of the student roster, keyed by matric number.
+
+RosterIndex is built once from (matric_no, name, course_id) rows and never
+changes afterwards, so threads share it without locking; a changed roster
+means building a new index. Matric numbers are compared upper-cased with
+whitespace removed. They are kept in one sorted list, so a prefix search
+is two bisects plus a slice, and an exact lookup is a dict hit.
+"""
+import bisect
+from collections import namedtuple
+
+RosterEntry = namedtuple('RosterEntry', ['matric_no', 'name', 'course_ids'])
+
+
+def normalize_matric_no(raw):
+    return ''.join(str(raw or '').split()).upper()
+
+
+class RosterIndex:
+    def __init__(self, rows):
+        # rows: (matric_no, name, course_id or None) per enrollment
+        students = {}
+        for matric_no, name, course_id in rows:
+            key = normalize_matric_no(matric_no)
+            entry = students.setdefault(key, (matric_no, name, set()))
+            if course_id is not None:
+                entry[2].add(course_id)
+        self._students = {key: RosterEntry(matric_no, name, frozenset(course_ids))
+                          for key, (matric_no, name, course_ids) in students.items()}
+        self._keys = sorted(self._students)
+        # Courses with at least one enrolled student
+        self.course_ids = frozenset(course_id for entry in self._students.values()
+                                    for course_id in entry.course_ids)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get(self, matric_no):
+        return self._students.get(normalize_matric_no(matric_no))
+
+    def has_roster(self, course_id):
+        return course_id in self.course_ids
+
+    def complete(self, prefix, limit=10, course_id=None):
+        # Entries whose matric number starts with prefix, in matric order;
+        # course_id limits them to students enrolled in that course
+        prefix = normalize_matric_no(prefix)
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + '\U0010ffff', lo=start)
+        matches = []
+        for i in range(start, end):
+            entry = self._students[self._keys[i]]
+            if course_id is None or course_id in entry.course_ids:
+                matches.append(entry)
+                if len(matches) >= limit:
+                    break
+        return matches
@@ -0,0 +1,92 @@
+"""Check that the hot route queries are served by indexes.
+
+Builds the same queries the routes run, asks SQLite for EXPLAIN QUERY PLAN
+against a scratch in-memory schema and fails if a query does not use the
+expected index or falls back to sorting in a temp B-tree.
+
+    python scripts/check_query_plans.py
+"""
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Attendance, LectureSession, StudentRecord  # noqa: E402
+from records import records_page_query, encode_records_cursor, filter_records_query  # noqa: E402
+
+
+def compile_sql(query, engine):
+    statement = query.statement if hasattr(query, 'statement') else query
+    return str(statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+
+
+def explain(engine, sql):
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+
+
+def build_checks():
+    cursor = encode_records_cursor(StudentRecord(id=100, timestamp=datetime(2025, 1, 1, 9, 0)))
+    day = datetime(2025, 1, 1)
+    return [
+        ('records first page', records_page_query({}),
+         'ix_student_record_timestamp_id'),
+        ('records next page', records_page_query({}, cursor),
+         'ix_student_record_timestamp_id'),
+        ('records by course', records_page_query({'course': 'CSC 301'}),
+         'ix_student_record_course_timestamp'),
+        ('records by status', records_page_query({'status': 'inactive'}),
+         'ix_student_record_active_timestamp'),
+        ('records by lecture session', records_page_query({'session_id': 7}),
+         'ix_student_record_session_timestamp'),
+        ('records by location flag', records_page_query({'location': 'outside'}),
+         'ix_student_record_location_flag_timestamp'),
+        ('csv export by course and date',
+         filter_records_query(StudentRecord.query, {'course': 'CSC 301', 'start_date': day, 'end_date': day})
+         .order_by(StudentRecord.timestamp.desc(), StudentRecord.id.desc()),
+         'ix_student_record_course_timestamp'),
+        ('attendance by student and course',
+         Attendance.query.filter_by(matric_no='U19/FEN/URP/001', course='URP 301'),
+         'ix_attendance_matric_no_course'),
+        ('attendance by course',
+         Attendance.query.filter_by(course='URP 301').order_by(Attendance.timestamp.desc()),
+         'ix_attendance_course_timestamp'),
+        ('duplicate submission probe',
+         StudentRecord.query.with_entities(StudentRecord.id)
+         .filter_by(session_window=day, course='URP 301', matric_no='U19/FEN/URP/001'),
+         'ix_student_record_submission'),
+        ('open lecture sessions',
+         LectureSession.query.filter(LectureSession.closes_at >= day),
+         'ix_lecture_session_closes_at'),
+    ]
+
+
+def main():
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+
+    failures = 0
+    with app.app_context():
+        for name, query, index in build_checks():
+            plan = explain(engine, compile_sql(query, engine))
+            uses_index = any(index in line for line in plan)
+            sorts = any('TEMP B-TREE' in line for line in plan)
+            ok = uses_index and not sorts
+            failures += not ok
+            print(f"[{'ok' if ok else 'FAIL'}] {name} (expects {index})")
+            for line in plan:
+                print(f"       {line}")
+
+    if failures:
+        print(f"{failures} query plan check(s) failed")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())